@@ -0,0 +1,167 @@
+"""The darkened wallpaper strip behind the bar.
+
+The strip is rendered from the wallpaper file rather than grabbed from the
+screen, so it never contains the bar itself or the windows that happened
+to be open. Windows' default "Fill" placement is assumed. Rendering only
+touches QImage, which is safe off the GUI thread, and runs on one worker.
+
+Results are cached in memory and as PNGs on disk, keyed by wallpaper path,
+its mtime, the screen size, the strip and the device pixel ratio. A start
+with an unchanged wallpaper therefore loads one small PNG. Every change of
+wallpaper writes a new file, so after each write only the most recently
+used max_disk_entries files are kept. While a render
+is pending, the bar shows a solid translucent fill.
+"""
+import hashlib
+import logging
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QPoint, QRect, QSize
+from PyQt5.QtGui import QColor, QImage, QImageReader, QPainter
+
+log = logging.getLogger("pytaskbar.background")
+
+DARKEN_COLOR = QColor(0, 0, 0, 196)  # Laid over the wallpaper; also the fill while nothing is rendered
+
+BackgroundKey = namedtuple("BackgroundKey", ["path", "mtime", "screen_width", "screen_height", "strip", "ratio"])
+
+
+def background_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+    return os.path.join(base, "PyTaskBar", "background")
+
+
+def background_key(wallpaper_path, screen_size, strip, ratio):
+    # `strip` is (x, y, width, height) relative to the screen; None when there is no wallpaper to render
+    if not wallpaper_path:
+        return None
+    try:
+        mtime = os.stat(wallpaper_path).st_mtime_ns
+    except OSError:
+        return None
+    return BackgroundKey(wallpaper_path, mtime, screen_size[0], screen_size[1], tuple(strip), ratio)
+
+
+def render_strip(key):
+    # Scale the wallpaper to cover the screen, cut out the strip and darken it; None if it cannot be read
+    reader = QImageReader(key.path)
+    size = reader.size()
+    if not size.isValid() or size.isEmpty():
+        return None
+    ratio = key.ratio
+    screen_width, screen_height = round(key.screen_width * ratio), round(key.screen_height * ratio)
+    x, y, width, height = (round(value * ratio) for value in key.strip)
+
+    scale = max(screen_width / size.width(), screen_height / size.height())
+    offset_x = (size.width() * scale - screen_width) / 2
+    offset_y = (size.height() * scale - screen_height) / 2
+    # Only the part of the file under the strip is decoded and scaled, not the whole wallpaper
+    source = QRect(int((x + offset_x) / scale), int((y + offset_y) / scale),
+                   max(1, round(width / scale)), max(1, round(height / scale))).intersected(QRect(QPoint(0, 0), size))
+    reader.setClipRect(source)
+    reader.setScaledSize(QSize(width, height))
+    strip = reader.read()
+    if strip.isNull():
+        return None
+
+    image = strip.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    painter = QPainter(image)
+    painter.fillRect(image.rect(), DARKEN_COLOR)
+    painter.end()
+    image.setDevicePixelRatio(ratio)
+    return image
+
+
+class BackgroundRenderer:
+    """Renders strips on a worker thread and remembers them.
+
+    `deliver(key, image)` is called from the worker; the app turns it into
+    a queued signal and passes the result back to `finished` on the GUI
+    thread, so the cache is only touched there. A key already being
+    rendered is not queued again; every request is delivered, failed ones
+    as None, so its key always leaves `pending`.
+    """
+
+    def __init__(self, deliver, cache_dir=None, max_entries=4, max_disk_entries=8):
+        self.deliver = deliver
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries  # A few screens and scales, and the wallpaper before the last
+        self.images = OrderedDict()  # key -> QImage
+        self.pending = set()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background")
+        self.renders = 0
+        self.disk_hits = 0
+        self.errors = 0
+
+    def lookup(self, key):
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def request(self, key):
+        if key in self.pending:
+            return
+        self.pending.add(key)
+        self.executor.submit(self.load, key)
+
+    def load(self, key):
+        image = None
+        try:
+            path = self.cache_path(key)
+            image = QImage(path) if path and os.path.exists(path) else None
+            if image is not None and not image.isNull():
+                self.disk_hits += 1
+                image.setDevicePixelRatio(key.ratio)
+                os.utime(path)  # Most recently used, so prune_disk_cache keeps it
+            else:
+                self.renders += 1
+                image = render_strip(key)
+                if image is not None and path:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    image.save(path, "PNG")
+                    self.prune_disk_cache()
+        except Exception:
+            log.exception("Rendering the background for %s failed", key.path)
+            self.errors += 1
+        finally:
+            # finished() clears `pending` on the GUI thread, also after a failure
+            self.deliver(key, image)
+
+    def finished(self, key, image):
+        self.pending.discard(key)
+        if image is None:
+            return
+        self.images[key] = image
+        self.images.move_to_end(key)
+        while len(self.images) > self.max_entries:
+            self.images.popitem(last=False)
+
+    def cache_path(self, key):
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha1(repr(tuple(key)).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}.png")
+
+    def prune_disk_cache(self):
+        # Runs on the worker, the only thread touching the cache directory; a slideshow would grow it forever
+        with os.scandir(self.cache_dir) as entries:
+            files = [(entry.stat().st_mtime_ns, entry.path) for entry in entries
+                     if entry.name.endswith(".png") and entry.is_file()]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(reverse=True)
+        for _, path in files[self.max_disk_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Still open elsewhere; tried again after the next write
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {"renders": self.renders, "disk_hits": self.disk_hits, "errors": self.errors, "entries": len(self.images)}
@@ -0,0 +1,420 @@
+"""The bar widget: one per screen, a view of the shared TaskbarModel.
+
+FixedWindowApp only holds widgets. Everything inside the window is made
+by build(), so the supervisor can rebuild a bar in place after reloading
+this module or after an exception, keeping the window, its AppBar
+registration and the model.
+"""
+import os
+import sys
+import logging
+from PyQt5.QtWidgets import QApplication, QPushButton, QWidget, QStyle, QMenu
+from PyQt5.QtCore import Qt, QTimer, QAbstractNativeEventFilter, QDateTime, QSize
+from PyQt5.QtGui import QIcon, QCursor
+from ctypes import wintypes
+from widgets import BackgroundStrip, DraggableButton, TaskbarList
+from layout import BUTTON_HEIGHT, changed_parts, compute_layout, screen_inputs
+from background import DARKEN_COLOR, background_key
+from grouping import GroupRow, app_name
+from hotkeys import HOTKEY_ID_BASE, SLOT_COUNT, WM_HOTKEY
+
+ASFW_ANY = -1
+ABE_LEFT = 0
+
+VK_LWIN = 0x5B
+VK_MENU = 0x12  # Alt
+VK_D = 0x44
+
+WM_SETTINGCHANGE = 0x001A
+WM_DISPLAYCHANGE = 0x007E
+WM_DPICHANGED = 0x02E0
+SPI_SETDESKWALLPAPER = 0x0014
+SPI_SETWORKAREA = 0x002F
+
+log = logging.getLogger("pytaskbar.bar")
+
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, relative_path)
+    return os.path.join(os.path.abspath("."), relative_path)
+
+class ShellHookListener(QAbstractNativeEventFilter):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def nativeEventFilter(self, event_type, message):
+        if event_type == "windows_generic_MSG":
+            msg = wintypes.MSG.from_address(int(message))
+            if msg.message == self.model.WM_SHELLHOOKMESSAGE:
+                log.debug("Shell message received: wParam=%s", msg.wParam)
+                self.model.on_shell_message(msg.wParam, msg.lParam)
+            elif msg.message == WM_DISPLAYCHANGE:
+                # Monitor handles may now point elsewhere; every window is located again
+                self.model.displays_changed()
+            elif msg.message == WM_DPICHANGED or (msg.message == WM_SETTINGCHANGE and msg.wParam == SPI_SETWORKAREA):
+                # Qt reports most of these through QScreen too; a relayout that changes nothing costs nothing
+                self.model.schedule_layout()
+            elif msg.message == WM_SETTINGCHANGE and msg.wParam == SPI_SETDESKWALLPAPER:
+                self.model.schedule_background_update()
+            elif msg.message == WM_HOTKEY and HOTKEY_ID_BASE <= msg.wParam < HOTKEY_ID_BASE + SLOT_COUNT:
+                # msg.time is the key-down tick, so the latency covers the whole trip to SetForegroundWindow
+                self.model.hotkeys.dispatch(msg.wParam - HOTKEY_ID_BASE, msg.time)
+                return True, 0
+        return False, 0
+
+class FixedWindowApp(QWidget):
+    """One bar, docked to the left edge of `screen`.
+
+    The bar only holds widgets; windows, icons and hotkeys come from the
+    shared TaskbarModel, which hands it the rows of its monitor.
+    """
+
+    def __init__(self, model, screen, monitor=None):
+        super().__init__()
+        self.model = model
+        self.bar_screen = screen
+        # Windows are matched to bars by monitor device name, which is the screen name on Windows
+        self.monitor = monitor or screen.name()
+        self.bar_layout = None
+
+        # Set window title (optional, as window doesn't have a title bar)
+        self.setWindowTitle('固定左側窗口')
+        
+        # Remove window frame, making it impossible to resize or move
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.build()
+
+        # Use QTimer to delay the move operation slightly
+        QTimer.singleShot(100, self.move_to_left)
+
+    def build(self):
+        # Everything inside the window; the window itself, its position and its AppBar outlive a rebuild
+        self.placeholder_icon = self.style().standardIcon(QStyle.SP_DesktopIcon)
+        self.background_key = None
+        self.background_timer = QTimer(self)
+        self.background_timer.setSingleShot(True)
+        self.background_timer.timeout.connect(self.update_background)
+        self.layout_timer = QTimer(self)
+        self.layout_timer.setSingleShot(True)
+        self.layout_timer.timeout.connect(self.relayout)
+        self.initUI()
+
+        # The clock has its own timer, fired on minute boundaries
+        self.clock_timer = QTimer(self)
+        self.clock_timer.setSingleShot(True)
+        self.clock_timer.timeout.connect(self.update_clock)
+        self.update_clock()
+
+        self.model.add_bar(self)
+
+    def teardown(self):
+        # Undo build(); runs before the class is swapped for a reloaded one, so these are still the old methods
+        self.model.detach_bar(self)
+        for signal in self.screen_signals():
+            signal.disconnect(self.schedule_layout)
+        for child in self.children():
+            if isinstance(child, QTimer):
+                child.stop()
+            elif child.isWidgetType():
+                child.hide()
+            child.deleteLater()
+
+    def rebuild(self):
+        self.teardown()
+        self.build()
+
+    def screen_signals(self):
+        screen = self.bar_screen
+        return [screen.geometryChanged, screen.availableGeometryChanged, screen.logicalDotsPerInchChanged, screen.physicalDotsPerInchChanged]
+
+    def initUI(self):
+        # Set a darkened background; a translucent fill until the wallpaper strip is rendered
+        self.background_strip = BackgroundStrip(DARKEN_COLOR, self)
+
+        normal_button_style = "QPushButton { background-color: rgba(0, 0, 0, 0.4); color: white; border: none; text-align: center;} QPushButton:hover {background: rgba(128,128,128, 0.3); line-height: 150%; } QToolTip{background-color: white; color: black; border: 1px solid black;}"
+        
+        # Create a button to simulate pressing the Windows key
+        self.windows_key_button = DraggableButton('', self)
+        win_icon = QIcon(resource_path("windows.svg"))  # 从主题获取图标，或使用自己的路径
+        self.windows_key_button.setIcon(win_icon)
+        self.windows_key_button.setIconSize(QSize(20, 20))  # 设置图标大小
+        self.windows_key_button.clicked.connect(self.press_windows_key)
+        self.windows_key_button.setStyleSheet(normal_button_style)
+
+        # Create a button to close the application
+        self.close_button = QPushButton('', self)
+        # 设置一个带叉叉的图标，可以使用任意合适的图标文件路径
+        close_icon = QIcon(resource_path("close.svg"))  # 从主题获取图标，或使用自己的路径
+        self.close_button.setIcon(close_icon)
+        self.close_button.setIconSize(QSize(24, 24))  # 设置图标大小
+        self.close_button.clicked.connect(self.close_app)
+        self.close_button.setStyleSheet(normal_button_style)
+
+        # Create a button to open volume setting
+        self.volume_button = QPushButton('', self)
+        volume_icon = QIcon(resource_path("volume.svg"))  # 从主题获取图标，或使用自己的路径
+        self.volume_button.setIcon(volume_icon)
+        self.volume_button.setIconSize(QSize(16, 16))  # 设置图标大小
+        self.volume_button.clicked.connect(self.open_volume_setting)
+        self.volume_button.setStyleSheet(normal_button_style)
+
+        # Create a button to open wifi setting
+        self.wifi_button = QPushButton('', self)
+        wifi_icon = QIcon(resource_path("wifi.svg"))  # 从主题获取图标，或使用自己的路径
+        self.wifi_button.setIcon(wifi_icon)
+        self.wifi_button.setIconSize(QSize(16, 16))  # 设置图标大小
+        self.wifi_button.clicked.connect(self.open_wifi_setting)
+        self.wifi_button.setStyleSheet(normal_button_style)
+
+        # Create a button to display the current date and time
+        current_time = QDateTime.currentDateTime()
+        formatted_time = current_time.toString("AP hh:mm\ndddd\nyyyy/MM/dd")
+        self.date_key_button = QPushButton(formatted_time, self)
+        self.date_key_button.clicked.connect(self.press_windows_alt_d)
+        self.date_key_button.setStyleSheet(normal_button_style)
+
+        self.show_desktop_button = QPushButton("", self)
+        self.show_desktop_button.clicked.connect(self.press_windows_d)
+        self.show_desktop_button.setStyleSheet("background-color: rgba(255,255,255,0.6); border: none; ")
+
+        # Window buttons live in a virtualized list between the Windows button and the tray;
+        # it only keeps as many buttons as rows fit and scrolls through the rest
+        self.taskbar_list = TaskbarList(self, BUTTON_HEIGHT, self.model.text_elider, self.placeholder_icon)
+        self.taskbar_list.activated.connect(self.model.toggle_window)
+        self.taskbar_list.group_activated.connect(self.show_group_menu)
+        self.taskbar_list.context_requested.connect(self.show_row_menu)
+        self.taskbar_list.row_moved.connect(self.model.move_row)
+        self.background_strip.lower()  # Make sure the darkened background is behind other widgets
+
+        # Every rectangle comes from layout.compute_layout; a screen change only moves what it affects
+        self.parts = {
+            "background": self.background_strip,
+            "windows_key": self.windows_key_button,
+            "window_list": self.taskbar_list,
+            "volume": self.volume_button,
+            "wifi": self.wifi_button,
+            "clock": self.date_key_button,
+            "close": self.close_button,
+            "show_desktop": self.show_desktop_button,
+        }
+        self.apply_layout(place_all=True)
+        self.update_background()
+
+        for signal in self.screen_signals():
+            signal.connect(self.schedule_layout)
+
+        # Buttons for each window are added by the model, once a bar has been painted
+
+    def apply_layout(self, place_all=False):
+        # Returns True if anything moved; place_all positions freshly built parts even if the screen is unchanged
+        layout = compute_layout(screen_inputs(self.bar_screen))
+        old = self.bar_layout
+        if layout == old and not place_all:
+            return False
+        for name in (list(layout.parts) if place_all else changed_parts(old, layout)):
+            self.parts[name].setGeometry(*layout.parts[name])
+        if old is None or layout.window[2:] != old.window[2:]:
+            self.setFixedSize(*layout.window[2:])
+        if old is None or layout.window[:2] != old.window[:2]:
+            self.move(*layout.window[:2])
+        self.bar_layout = layout
+        if old is None or layout.app_bar != old.app_bar:
+            # The registration is kept; only the reserved rectangle is set again
+            self.register_app_bar()
+        return True
+
+    def schedule_layout(self):
+        # Resolution and DPI changes arrive as several signals; lay out once they have settled
+        self.layout_timer.start(100)
+
+    def relayout(self):
+        if self.apply_layout():
+            self.update_background()
+
+    def update_background(self):
+        with self.model.instruments.stage("background"):
+            screen = self.bar_screen
+            geometry = screen.geometry()
+            left, top, width, height = self.bar_layout.window
+            # The strip is the part of the screen's wallpaper under the bar
+            strip = (left - geometry.left(), top - geometry.top(), width, height)
+            key = background_key(self.model.desktop.wallpaper_path(), (geometry.width(), geometry.height()), strip, screen.devicePixelRatio())
+            self.background_key = key
+            # Bars on screens of the same size share one rendered strip
+            image = self.model.background.lookup(key) if key is not None else None
+            self.background_strip.set_image(image)
+            if key is not None and image is None:
+                self.model.background.request(key)
+
+    def schedule_background_update(self):
+        # Settings changes come in bursts; recompute once they have settled
+        self.background_timer.start(250)
+
+    def on_background_ready(self, key, image):
+        if key == self.background_key:
+            self.background_strip.set_image(image)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        self.model.bar_painted()
+
+    def update_clock(self):
+        current_time = QDateTime.currentDateTime()
+        formatted_time = current_time.toString("AP hh:mm\ndddd\nyyyy/MM/dd")
+        self.date_key_button.setText(formatted_time)
+        # Fire again right at the start of the next minute
+        self.clock_timer.start(60000 - current_time.toMSecsSinceEpoch() % 60000)
+
+    def show_group_menu(self, key):
+        # A collapsed group pops up the list of its windows
+        menu = QMenu(self)
+        for hwnd in self.model.window_groups.windows(key):
+            action = menu.addAction(self.model.windows[hwnd].title)
+            action.triggered.connect(lambda checked, hwnd=hwnd: self.model.toggle_window(hwnd))
+        menu.exec_(QCursor.pos())
+
+    def show_row_menu(self, row, pos):
+        menu = QMenu(self)
+        if isinstance(row, GroupRow):
+            action = menu.addAction(f"Expand {row.title}")
+            action.triggered.connect(lambda: self.model.set_group_collapsed(row.key, False))
+        else:
+            key = self.model.window_groups.group_of[row.hwnd]
+            action = menu.addAction(f"Collapse {app_name(key)}")
+            action.triggered.connect(lambda: self.model.set_group_collapsed(key, True))
+        menu.exec_(pos)
+
+    def close_app(self):
+        self.model.close()
+        QApplication.instance().quit()
+        
+    def open_wifi_setting(self):
+        import subprocess
+        try:
+            # 使用 subprocess 執行命令
+            subprocess.run(['start', 'explorer.exe', 'ms-availablenetworks:'], shell=True, check=True)
+        except subprocess.CalledProcessError as e:
+            log.error("Error occurred: %s", e)
+
+    def open_volume_setting(self):
+        import subprocess
+        try:
+            # 使用 subprocess 執行命令
+            subprocess.run(['start', 'sndvol'], shell=True, check=True)
+        except subprocess.CalledProcessError as e:
+            log.error("Error occurred: %s", e)
+
+    def move_to_left(self):
+        # Move the window to the left edge of its screen
+        self.move(*self.bar_layout.window[:2])
+
+    def press_windows_key(self):
+        # Simulate pressing the Windows key
+        self.model.desktop.press_keys(VK_LWIN)
+
+    def press_windows_alt_d(self):
+        # 模拟按下 Windows + Alt + D
+        self.model.desktop.press_keys(VK_LWIN, VK_MENU, VK_D)
+
+    def press_windows_d(self):
+        # 模拟按下 Windows + D
+        self.model.desktop.press_keys(VK_LWIN, VK_D)
+
+    def register_app_bar(self):
+        # Register the bar as an AppBar on the left edge of its screen to reserve space there
+        self.model.desktop.register_app_bar(int(self.winId()), ABE_LEFT, *self.bar_layout.app_bar)
+
+    def unregister_app_bar(self):
+        # Remove the AppBar reservation when closing the app
+        self.model.desktop.remove_app_bar(int(self.winId()))
+
+    def retire(self):
+        # The screen went away; give back its space and hand its windows to the other bars
+        self.unregister_app_bar()
+        self.model.remove_bar(self)
+        self.deleteLater()
+
+    def move_to_screen(self, screen, monitor=None):
+        # The bar's screen went away and it is the last bar: follow another screen, keeping the window,
+        # its widgets and the shell hook. The AppBar is registered again for the new screen
+        for signal in self.screen_signals():
+            signal.disconnect(self.schedule_layout)
+        self.bar_screen = screen
+        self.monitor = monitor or screen.name()
+        for signal in self.screen_signals():
+            signal.connect(self.schedule_layout)
+        self.bar_layout = None
+        self.apply_layout(place_all=True)
+        self.update_background()
+
+    def park(self):
+        # No screen is left to follow; give back the space and wait hidden for move_to_screen
+        self.unregister_app_bar()
+        self.hide()
+
+
+class ScreenBars:
+    """The bars of a running shell, one per chosen screen.
+
+    With follow_all every screen that is added gets a bar. In every mode a
+    bar whose screen is removed is retired while other bars remain; the
+    last bar moves to the primary screen instead, or is parked until a
+    screen is added when none is left, so no bar outlives its QScreen.
+    Bars are made through the module's FixedWindowApp, so those added after
+    a reload get the new class.
+    """
+
+    def __init__(self, app, model, screens, follow_all=False):
+        self.app = app
+        self.model = model
+        self.follow_all = follow_all
+        self.bars = {}  # QScreen -> FixedWindowApp
+        self.parked = None
+        for screen in screens:
+            self.add(screen)
+        app.screenAdded.connect(self.screen_added)
+        app.screenRemoved.connect(self.screen_removed)
+
+    def add(self, screen):
+        bar = self.bars[screen] = FixedWindowApp(self.model, screen)
+        bar.show()
+        return bar
+
+    def screen_added(self, screen):
+        if self.parked is not None:
+            bar, self.parked = self.parked, None
+            self.bars[screen] = bar
+            bar.move_to_screen(screen)
+            bar.show()
+        elif self.follow_all:
+            self.add(screen)
+        self.model.displays_changed()
+
+    def screen_removed(self, screen):
+        bar = self.bars.pop(screen, None)
+        if bar is not None:
+            if self.bars:
+                bar.retire()
+            else:
+                # Qt makes another screen primary before it reports the old one removed
+                candidates = [self.app.primaryScreen()] + self.app.screens()
+                target = next((other for other in candidates if other is not None and other is not screen), None)
+                if target is None:
+                    bar.park()
+                    self.parked = bar
+                else:
+                    self.bars[target] = bar
+                    bar.move_to_screen(target)
+        self.model.displays_changed()
+
+def select_screens(app, choice):
+    # "all", "primary", or a tuple of valid indices into QApplication.screens(), as main.screen_choice parses it
+    screens = app.screens()
+    if choice == "all":
+        return screens
+    if choice == "primary":
+        return [app.primaryScreen()]
+    return [screens[index] for index in choice]
@@ -0,0 +1,1450 @@
+"""Headless benchmarks for the taskbar refresh path.
+
+    python bench.py                         # run every benchmark
+    python bench.py snapshot                # run only the named ones
+    python bench.py --json after.json       # also save the results
+    python bench.py --compare before.json   # show the change against saved results
+
+Everything here runs on a fake window source, so it works on Linux; Qt
+benchmarks use the offscreen platform. The desktop_* benchmarks run the
+whole bar on a SimulatedDesktop driven by a seeded script, so
+their numbers can be compared between commits.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from background import BackgroundRenderer, background_key, render_strip
+from desktop import SimulatedDesktop
+from elide import TextElider, elide_text
+from enumeration import BatchedEnumerator, PyWin32Enumerator
+from event_source import EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_MINIMIZEEND, EVENT_SYSTEM_MINIMIZESTART
+from fetch_pool import IconFetchPool
+from foreground import ACTIVATE, MINIMIZE, RESTORE, ForegroundTracker
+from grouping import GroupIndex
+from hotkeys import HotkeyDispatcher
+from icon_cache import IconCache
+from instrumentation import Histogram, Instruments
+from ordering import OrderedKeys, load_order, save_order
+from refresh_scheduler import ReconcileSweep, RefreshScheduler
+from window_source import FakeWindowSource, WindowSource, records_from_columns
+from window_store import WindowStore
+
+BENCHMARKS = {}
+RECORDED_WINDOWS = None  # --windows: a window list saved by `python enumeration.py`
+RECORDED_SESSION = None  # --session: a session saved by `python main.py --record FILE`
+REPLAY_SPEED = 10.0
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__[len("bench_"):]] = func
+    return func
+
+
+# Window titles as they show up on a busy desktop
+TITLE_CORPUS = [
+    "Inbox (1,204) - someone@example.com - Mail - Google Chrome",
+    "main.py - PyTaskBar - Visual Studio Code",
+    "Windows PowerShell",
+    "C:\\Users\\dev\\AppData\\Local\\Programs\\Python\\Python311\\python.exe",
+    "Quarterly report FINAL (2) - Excel",
+    "General (Engineering) | Microsoft Teams",
+    "Spotify Premium",
+    "python - Why is QFontMetrics.width deprecated in favour of horizontalAdvance? - Stack Overflow - "
+    "Mozilla Firefox",
+    "Task Manager",
+    "File Explorer",
+    "Pull request #1287: Rework the refresh path so that an idle desktop causes no widget mutations per tick "
+    "and title storms are coalesced before they reach the GUI thread by someone · Pull Request · GitHub — "
+    "Mozilla Firefox Developer Edition",
+    "Untitled - Notepad",
+    "Zoom Meeting",
+    "~/src/project: htop — Windows Terminal",
+    "設定",
+    "小算盤",
+    "https://www.example.com/a/really/long/path/with/many/segments/that/keeps/going/and/going?query=string"
+    "&with=a&lot=of&parameters=1 - Microsoft​ Edge",
+]
+
+
+def qt_app():
+    # Qt benchmarks run headless
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def make_desktop(count, hidden=0):
+    source = FakeWindowSource()
+    for i in range(count):
+        source.add_window(f"Window {i} - Some Application", pid=1000 + i % 17)
+    for i in range(hidden):
+        source.add_window("", visible=False)
+    return source
+
+
+@benchmark
+def bench_snapshot():
+    # Win32 round-trips per refresh with 60 taskbar windows and 200 hidden ones
+    source = make_desktop(60, hidden=200)
+    rounds = 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        source.snapshot()
+    elapsed = time.perf_counter() - start
+    result = {name: count / rounds for name, count in sorted(source.calls.items())}
+    result["us_per_refresh"] = elapsed / rounds * 1e6
+    return result
+
+
+RULE_CASES = [
+    # (title, class name, ex_style, style, pid, expected to be on the bar)
+    ("Inbox - Outlook", "rctrl_renwnd32", 0, 0, 1001, True),
+    ("Program Manager", "Progman", 0, 0, 1002, False),
+    ("Default IME", "IME", 0, 0, 1003, False),
+    ("Microsoft Text Input Application", "Windows.UI.Core.CoreWindow", 0, 0, 1004, False),
+    ("Floating toolbar", "ToolbarWindow", 0x80, 0, 1005, False),
+    ("OBS 30.0 - Projector", "OBSProjector", 0x80, 0, 1006, True),         # Tool window, forced in by exe
+    ("NVIDIA GeForce Overlay", "CEF-OSC-WIDGET", 0x08, 0, 1007, False),     # Excluded by exe
+    ("Calculator", "ApplicationFrameWindow", 0x00200000, 0, 1008, False),
+    ("Meeting compact view | Teams", "TeamsWebView", 0, 0, 1009, False),  # Excluded by title
+    ("Chat | Teams", "TeamsWebView", 0, 0, 1009, True),
+    ("Popup notification", "Chrome_WidgetWin_1", 0, 0x80000000, 1010, False),  # Popup without a caption
+    ("", "Chrome_WidgetWin_1", 0, 0, 1010, False),
+]
+
+RULE_SET = [
+    {"action": "include", "exe": "obs64.exe"},
+    {"action": "exclude", "exe": "nvcontainer.exe"},
+    {"action": "exclude", "class": "TeamsWebView", "title": "compact view"},
+    {"action": "exclude", "style": "WS_POPUP", "not_style": "WS_CAPTION"},
+]
+
+
+def rules_desktop(windows=200):
+    # RULE_CASES plus ordinary windows, with executables matching the rule set
+    from window_rules import DEFAULT_RULES
+    source = FakeWindowSource()
+    exes = {1006: "obs64.exe", 1007: "nvcontainer.exe"}
+    source.query_image_path = lambda pid: f"C:\\Program Files\\App{pid}\\{exes.get(pid, f'app{pid}.exe')}"
+    expected = {}
+    for title, class_name, ex_style, style, pid, keep in RULE_CASES:
+        expected[source.add_window(title, ex_style=ex_style, pid=pid, class_name=class_name, style=style)] = keep
+    for i in range(windows - len(RULE_CASES)):
+        expected[source.add_window(f"{TITLE_CORPUS[i % len(TITLE_CORPUS)]} {i}", pid=2000 + i % 17)] = True
+    source.set_rules(RULE_SET + DEFAULT_RULES)
+    return source, expected
+
+
+@benchmark
+def bench_window_rules():
+    # Verdicts for synthetic windows, and the cost of evaluating rules against hitting the per-hwnd cache
+    from window_rules import DEFAULT_RULES, compile_rules
+    source, expected = rules_desktop()
+    shown = {record.hwnd for record in source.snapshot()}
+    wrong = [source.windows[hwnd].title for hwnd, keep in expected.items() if (hwnd in shown) != keep]
+    assert not wrong, wrong
+
+    start = time.perf_counter()
+    for _ in range(100):
+        compile_rules(RULE_SET + DEFAULT_RULES)
+    compile_us = (time.perf_counter() - start) * 1e4
+
+    records = list(source.windows.values())
+    window_filter = source.filter
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for record in records:
+            window_filter.evaluate(record.hwnd, record.ex_style, record.title)
+    evaluate_us = (time.perf_counter() - start) * 1e6 / (rounds * len(records))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for record in records:
+            window_filter.keep(record.hwnd, record.ex_style, record.title)
+    cached_us = (time.perf_counter() - start) * 1e6 / (rounds * len(records))
+
+    source.calls.clear()
+    for _ in range(100):
+        source.snapshot()
+    calls = dict(source.calls)
+    # A cached verdict is made again when the title, style or extended style it was made for changes
+    from window_rules import STYLE_BITS
+
+    def on_bar(hwnd):
+        return hwnd in {record.hwnd for record in source.snapshot()}
+
+    popup = source.add_window("Popup turned window", style=STYLE_BITS["WS_POPUP"])
+    assert not on_bar(popup)
+    source.styles[popup] |= STYLE_BITS["WS_CAPTION"]
+    shown_with_caption = on_bar(popup)
+    assert shown_with_caption
+    source.styles[popup] = STYLE_BITS["WS_POPUP"]
+    assert not on_bar(popup)
+    chat = source.add_window("Chat | Teams", pid=1009, class_name="TeamsWebView")
+    assert on_bar(chat)
+    source.set_title(chat, "Meeting compact view | Teams")
+    assert not on_bar(chat)
+    source.set_title(chat, "Chat | Teams")
+    assert on_bar(chat)
+    source.windows[chat] = source.windows[chat]._replace(ex_style=STYLE_BITS["WS_EX_TOOLWINDOW"])
+    assert not on_bar(chat)
+    source.windows[chat] = source.windows[chat]._replace(ex_style=0)
+    assert on_bar(chat)
+    result = {
+        "windows": len(records),
+        "wrong_verdicts": len(wrong),
+        "compile_us": compile_us,
+        "evaluate_us_per_window": evaluate_us,
+        "cached_us_per_window": cached_us,
+    }
+    # After the first pass no rule asks Windows for anything
+    result.update({f"{name}_per_refresh": calls.get(name, 0) / 100 for name in ("GetClassName", "GetWindowThreadProcessId")})
+    result["popup_shown_after_gaining_caption"] = shown_with_caption
+    result.update(window_filter.stats())
+    result["broken_rule_files_skipped"] = broken_rule_files_skipped()
+    return result
+
+
+BROKEN_RULE_FILES = [
+    "[{\"action\": \"exclude\", \"title\": \"(\"}]",       # Bad regex
+    "[{\"action\": \"exclude\", \"class\": 5}]",           # Class not a string
+    "[{\"action\": \"exclude\", \"style\": [\"WS_POPUP\", 3]}]",
+    "[{\"action\": \"exclude\", \"style\": {}}]",
+    "[5]",
+    "5",
+    "{\"action\": \"exclude\"}",
+    "[{\"action\": \"exclude\", \"class\": \"Progman\"",  # Truncated
+]
+
+
+def broken_rule_files_skipped():
+    # Every broken rules.json falls back to the default rules instead of keeping the bar from starting
+    from window_rules import DEFAULT_RULES, load_rules
+    skipped = 0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.json")
+        for text in BROKEN_RULE_FILES:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            rules = load_rules(path)
+            assert rules == DEFAULT_RULES, (text, rules)
+            skipped += 1
+    return skipped
+
+
+@benchmark
+def bench_diff():
+    # Change detection on 5,000 windows as the model runs it: idle tick, a title storm and open/close churn
+    source = make_desktop(5000)
+    store = WindowStore()
+    store.apply(source.snapshot(), lambda entries: tuple(entries.values()))
+    result = {}
+    hwnds = list(source.windows)
+
+    def run(label, mutate):
+        mutate()
+        start = time.perf_counter()
+        snapshot, patch = store.apply(source.snapshot(), lambda entries: tuple(entries.values()))
+        result[label + "_ms"] = (time.perf_counter() - start) * 1e3
+        result[label + "_patch_size"] = len(patch)
+
+    run("idle", lambda: None)
+    run("retitle_50", lambda: [source.set_title(hwnd, "changed") for hwnd in hwnds[:50]])
+    run("close_first", lambda: source.remove_window(hwnds[0]))
+    run("open_one", lambda: source.add_window("New window"))
+    return result
+
+
+@benchmark
+def bench_window_store():
+    # What the model keeps per window for 5,000 windows: a dict and a tuple of snapshot records, against
+    # the store's entries and its order tuple
+    import tracemalloc
+    source = make_desktop(5000)
+    hwnds = list(source.windows)
+    result = {}
+
+    # Bytes kept per window once the enumeration's temporaries are gone; titles are shared
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = source.snapshot()
+    snapshot_kept = ({record.hwnd: record for record in records}, tuple(records))
+    del records
+    result["snapshot_bytes_per_window"] = (tracemalloc.get_traced_memory()[0] - before) / len(hwnds)
+    before = tracemalloc.get_traced_memory()[0]
+    store = WindowStore()
+    kept = store.apply(source.snapshot(), lambda entries: tuple(entries.values()))[0]
+    result["store_bytes_per_window"] = (tracemalloc.get_traced_memory()[0] - before) / len(hwnds)
+    # Peak allocation of an unchanged refresh after the enumeration: snapshots keep a new record
+    # dict and order every time, the store only a new order tuple
+    records = source.snapshot()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    current = ({record.hwnd: record for record in records}, tuple(records))
+    result["snapshot_idle_refresh_peak_bytes"] = tracemalloc.get_traced_memory()[1] - before
+    del current, snapshot_kept, kept
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    store.apply(records, lambda entries: tuple(entries.values()))
+    result["store_idle_refresh_peak_bytes"] = tracemalloc.get_traced_memory()[1] - before
+    del records
+    tracemalloc.stop()
+    assert result["store_bytes_per_window"] < result["snapshot_bytes_per_window"], result
+    return result
+
+
+def recorded_window_list():
+    # [hwnd, ex_style, visible, title] per top-level window. Without a recording, a desktop shaped like
+    # one: a few hundred top-level windows, most hidden, some visible ones untitled or tool windows
+    if RECORDED_WINDOWS:
+        with open(RECORDED_WINDOWS, encoding="utf-8") as f:
+            return json.load(f)
+    rng = random.Random(4)
+    windows = []
+    for i in range(400):
+        visible = rng.random() < 0.2
+        title = rng.choice(TITLE_CORPUS) if visible and rng.random() < 0.7 else ""
+        ex_style = 0x80 if visible and rng.random() < 0.2 else 0x100
+        windows.append([0x10010 + i * 0x1A2, ex_style, visible, title])
+    return windows
+
+
+class RecordedUser32:
+    # The user32 calls BatchedEnumerator makes, answered from a recorded window list
+    def __init__(self, windows):
+        by_hwnd = {hwnd: (ex_style, visible, title) for hwnd, ex_style, visible, title in windows}
+        order = [hwnd for hwnd, _, _, _ in windows]
+
+        def EnumWindows(callback, lparam):
+            for hwnd in order:
+                if not callback(hwnd, lparam):
+                    break
+            return True
+
+        def GetWindowTextW(hwnd, buffer, size):
+            title = by_hwnd[hwnd][2][:size - 1]
+            buffer.value = title
+            return len(title)
+
+        self.EnumWindows = EnumWindows
+        self.IsWindowVisible = lambda hwnd: by_hwnd[hwnd][1]
+        self.GetWindowLongW = lambda hwnd, index: by_hwnd[hwnd][0]
+        self.GetWindowTextLengthW = lambda hwnd: len(by_hwnd[hwnd][2])
+        self.GetWindowTextW = GetWindowTextW
+
+
+class RecordedWin32gui:
+    # The win32gui calls PyWin32Enumerator makes, answered from the same list
+    def __init__(self, windows):
+        self.by_hwnd = {hwnd: (ex_style, visible, title) for hwnd, ex_style, visible, title in windows}
+        self.order = [hwnd for hwnd, _, _, _ in windows]
+
+    def EnumWindows(self, callback, extra):
+        # pywin32 enters the callback from C like ctypes does; pay the same transition per window
+        import ctypes
+        thunk = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)(lambda hwnd, lparam: bool(callback(hwnd, extra)))
+        for hwnd in self.order:
+            if not thunk(hwnd, 0):
+                break
+
+    def GetWindowLong(self, hwnd, index):
+        return self.by_hwnd[hwnd][0]
+
+    def IsWindowVisible(self, hwnd):
+        return self.by_hwnd[hwnd][1]
+
+    def GetWindowText(self, hwnd):
+        return self.by_hwnd[hwnd][2]
+
+
+class RecordedWindowSource(WindowSource):
+    # Win32WindowSource.snapshot() over a replayed enumerator
+    def __init__(self, enumerator):
+        super().__init__()
+        self.enumerator = enumerator
+
+    def snapshot(self):
+        self.snapshots += 1
+        return records_from_columns(self, self.enumerator.enumerate())
+
+    def query_pid(self, hwnd):
+        return 1000 + hwnd % 7
+
+    def query_image_path(self, pid):
+        return f"C:\\Program Files\\App{pid}\\app{pid}.exe"
+
+
+@benchmark
+def bench_enumeration():
+    # The pywin32 callback path against the batched ctypes path over one recorded window list. Both
+    # replay the list from Python, so this measures the Python side of each path, which is where the
+    # per-window fan-out costs; native call costs are the same or fewer for the batched path.
+    # Win32WindowSource uses pywin32 unless batched_vs_pywin32 drops below 1 here and on Windows.
+    windows = recorded_window_list()
+    result = {"windows": len(windows), "visible": sum(1 for window in windows if window[2])}
+    sources = {
+        "pywin32": RecordedWindowSource(PyWin32Enumerator(RecordedWin32gui(windows))),
+        "batched": RecordedWindowSource(BatchedEnumerator(RecordedUser32(windows), capacity=64)),
+    }
+    snapshots = {}
+    for name, source in sources.items():
+        snapshots[name] = source.snapshot()  # Warms the pid and verdict caches
+        calls = source.enumerator.stats()["calls"]
+        rounds = 200
+        start = time.perf_counter()
+        for _ in range(rounds):
+            source.snapshot()
+        result[f"{name}_snapshot_us"] = (time.perf_counter() - start) * 1e6 / rounds
+        result[f"{name}_calls_per_snapshot"] = (source.enumerator.stats()["calls"] - calls) / rounds
+    result["batched_vs_pywin32"] = result["batched_snapshot_us"] / result["pywin32_snapshot_us"]
+    result["taskbar_windows"] = len(snapshots["batched"])
+    result["same_records"] = snapshots["pywin32"] == snapshots["batched"]
+    result["batched_capacity"] = sources["batched"].enumerator.capacity  # Grown from 64 on the first pass
+    return result
+
+
+class FakeClock:
+    # Manual clock plus a timer queue, standing in for QTimer.singleShot
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+
+    def __call__(self):
+        return self.now
+
+    def schedule(self, delay, callback):
+        self.timers.append((self.now + delay, callback))
+
+    def advance(self, seconds):
+        self.now += seconds
+        due = [timer for timer in self.timers if timer[0] <= self.now]
+        self.timers = [timer for timer in self.timers if timer[0] > self.now]
+        for _, callback in sorted(due, key=lambda timer: timer[0]):
+            callback()
+
+
+@benchmark
+def bench_scheduler():
+    # A browser firing 200 title changes per second for 10 s, plus a window opening every second
+    clock = FakeClock()
+    work = {"refresh": 0, "retitle": 0}
+    scheduler = RefreshScheduler(
+        lambda: work.__setitem__("refresh", work["refresh"] + 1),
+        lambda hwnds: work.__setitem__("retitle", work["retitle"] + 1),
+        clock.schedule, window=0.05, clock=clock,
+    )
+    for tick in range(2000):
+        scheduler.title_changed(0x1000 + tick % 3)
+        if tick % 200 == 0:
+            scheduler.window_changed(0x2000 + tick)
+        clock.advance(0.005)
+    clock.advance(1.0)
+    return scheduler.stats()
+
+
+@benchmark
+def bench_idle_sweeps():
+    # Full rescans during ten idle minutes: 1 s polling versus the backing-off sweep
+    clock = FakeClock()
+    sweep = ReconcileSweep(lambda: False, clock.schedule, minimum=1.0, maximum=30.0, clock=clock)
+    sweep.start()
+    for _ in range(600):
+        clock.advance(1.0)
+    return {"polling_rescans": 600, "event_driven_rescans": sweep.sweeps, "final_interval_s": sweep.interval}
+
+
+@benchmark
+def bench_icon_cache():
+    # 2,000 window opens across 40 executables with a Zipf-ish skew, 32x32 ARGB icons
+    icon_bytes = 32 * 32 * 4
+    cache = IconCache(max_bytes=icon_bytes * 16, size_of=lambda value: icon_bytes)
+    conversions = 0
+
+    def convert():
+        nonlocal conversions
+        conversions += 1
+        return object()
+
+    for i in range(2000):
+        app = int(40 * (i * 0.6180339887 % 1) ** 3)
+        cache.get_or_create((f"app{app}.exe", 0x100 + app), convert)
+    result = cache.stats()
+    result["conversions"] = conversions
+    return result
+
+
+@benchmark
+def bench_icon_fetch():
+    # 40 windows, 5 slow (100 ms), 3 hung and 1 failing: time the caller spends blocked versus total fetch time
+    source = make_desktop(40)
+    hwnds = list(source.windows)
+    for hwnd in hwnds:
+        source.icons[hwnd] = hwnd + 1
+    for hwnd in hwnds[:5]:
+        source.icon_delays[hwnd] = 0.1
+    source.hung.update(hwnds[5:8])
+
+    class FailingSource:
+        # One window fails outright, as one destroyed in the middle of the call does
+        def fetch_icon_handle(self, hwnd, timeout):
+            if hwnd == hwnds[8]:
+                raise OSError("invalid window handle")
+            return source.fetch_icon_handle(hwnd, timeout)
+
+    delivered = []
+    logging.disable(logging.CRITICAL)
+    pool = IconFetchPool(FailingSource(), lambda hwnd, handle: delivered.append((hwnd, handle)), workers=4, timeout=0.25, hung_after=1)
+    start = time.perf_counter()
+    for hwnd in hwnds:
+        pool.request(hwnd)
+    blocked = time.perf_counter() - start
+    while len(delivered) < len(hwnds):
+        time.sleep(0.005)
+    total = time.perf_counter() - start
+    logging.disable(logging.NOTSET)
+    pool.shutdown()
+    result = pool.stats()
+    result["left_in_flight"] = len(pool.in_flight)
+    result["caller_blocked_ms"] = blocked * 1e3
+    result["all_delivered_ms"] = total * 1e3
+    return result
+
+
+@benchmark
+def bench_elide():
+    # Old char-by-char loop against the binary search, and the memoized elider on repeated titles
+    app = qt_app()
+    from PyQt5.QtWidgets import QPushButton
+    font_metrics = QPushButton().fontMetrics()
+    width = 96 - 16 - 15
+
+    class CountingMetrics:
+        calls = 0
+
+        def width(self, text):
+            CountingMetrics.calls += 1
+            return font_metrics.width(text)
+
+    metrics = CountingMetrics()
+
+    def char_by_char(title):
+        elided_text = title
+        if metrics.width(title) > width:
+            while metrics.width(elided_text + "...") > width and len(elided_text) > 0:
+                elided_text = elided_text[:-1]
+            elided_text += "..."
+        return elided_text
+
+    result = {}
+    for label, elide in (("char_by_char", char_by_char), ("binary_search", lambda title: elide_text(metrics.width, title, width))):
+        CountingMetrics.calls = 0
+        start = time.perf_counter()
+        for title in TITLE_CORPUS:
+            elide(title)
+        result[label + "_us_per_title"] = (time.perf_counter() - start) / len(TITLE_CORPUS) * 1e6
+        result[label + "_width_calls"] = CountingMetrics.calls
+
+    elider = TextElider()
+    start = time.perf_counter()
+    for _ in range(100):
+        for title in TITLE_CORPUS:
+            elider.elide(metrics, "bench", title, width)
+    result["memoized_us_per_title"] = (time.perf_counter() - start) / (100 * len(TITLE_CORPUS)) * 1e6
+    return result
+
+
+@benchmark
+def bench_hover():
+    # Sweep the mouse down a 40-button bar: style recomputations and animation frames per hover
+    app = qt_app()
+    from PyQt5.QtCore import QEvent, QObject, QVariantAnimation
+    from PyQt5.QtGui import QColor
+    from PyQt5.QtWidgets import QPushButton, QWidget
+    from widgets import TaskbarButton
+
+    class StyleCounter(QObject):
+        style_changes = 0
+
+        def eventFilter(self, obj, event):
+            if event.type() in (QEvent.StyleChange, QEvent.Polish):
+                StyleCounter.style_changes += 1
+            return False
+
+    def legacy_button(parent):
+        # The per-frame setStyleSheet approach this replaced
+        button = QPushButton("Window", parent)
+        original_color, hover_color = QColor(0, 0, 128, 128), QColor("red")
+
+        def animate(start, end):
+            animation = QVariantAnimation()
+            animation.setDuration(300)
+            animation.setStartValue(start)
+            animation.setEndValue(end)
+            animation.valueChanged.connect(lambda color: (
+                frames.__setitem__(0, frames[0] + 1),
+                button.setStyleSheet(f"QPushButton {{ background-color: rgba({color.red()}, {color.green()}, "
+                                     f"{color.blue()}, {color.alphaF()}); color: white; }}")))
+            animation.start()
+            button.animation = animation
+
+        button.enterEvent = lambda event: animate(original_color, hover_color)
+        button.leaveEvent = lambda event: animate(hover_color, original_color)
+        return button
+
+    def pooled_button(parent):
+        button = TaskbarButton("Window", parent)
+        button.hover_animation.valueChanged.connect(lambda value: frames.__setitem__(0, frames[0] + 1))
+        return button
+
+    result = {}
+    for label, make in (("setstylesheet", legacy_button), ("property", pooled_button)):
+        frames = [0]
+        bar = QWidget()
+        buttons = [make(bar) for _ in range(40)]
+        bar.show()
+        app.processEvents()
+        counter = StyleCounter()
+        for button in buttons:
+            button.installEventFilter(counter)
+        StyleCounter.style_changes = 0
+
+        start = time.perf_counter()
+        for button in buttons:
+            button.enterEvent(QEvent(QEvent.Enter))
+            end = time.perf_counter() + 0.05
+            while time.perf_counter() < end:
+                app.processEvents()
+            button.leaveEvent(QEvent(QEvent.Leave))
+        end = time.perf_counter() + 0.4
+        while time.perf_counter() < end:
+            app.processEvents()
+        result[label + "_ms"] = (time.perf_counter() - start) * 1e3
+        result[label + "_frames_per_hover"] = frames[0] / len(buttons)
+        result[label + "_style_changes_per_hover"] = StyleCounter.style_changes / len(buttons)
+        bar.deleteLater()
+        app.processEvents()
+    return result
+
+
+@benchmark
+def bench_virtual_list():
+    # Widgets alive and refresh cost per tick as the desktop grows to 1,000 windows
+    app = qt_app()
+    from PyQt5.QtGui import QIcon
+    from widgets import TaskbarList
+
+    result = {}
+    for count in (10, 100, 1000):
+        source = make_desktop(count)
+        hwnds = list(source.windows)
+        taskbar_list = TaskbarList(None, 32, TextElider(), QIcon())
+        taskbar_list.setGeometry(0, 0, 96, 1000)
+        taskbar_list.show()
+        app.processEvents()
+
+        store = WindowStore()
+        ticks = 50
+        start = time.perf_counter()
+        for tick in range(ticks):
+            source.set_title(hwnds[tick % count], f"Title {tick}")
+            snapshot, patch = store.apply(source.snapshot(), lambda entries: tuple(entries.values()))
+            if patch:
+                taskbar_list.set_rows(snapshot)
+        result[f"{count}_windows_ms_per_tick"] = (time.perf_counter() - start) / ticks * 1e3
+        result[f"{count}_windows_widgets"] = taskbar_list.widgets_created
+        taskbar_list.deleteLater()
+        app.processEvents()
+    return result
+
+
+@benchmark
+def bench_grouping():
+    # 1,000 windows from 17 programs: steady-state sync, churn, and rows once every group is collapsed
+    source = make_desktop(1000)
+    hwnds = list(source.windows)
+    groups = GroupIndex()
+    key_of = lambda record: source.process_image_path(record.pid)
+    groups.sync(source.snapshot(), key_of)
+
+    result = {}
+    start = time.perf_counter()
+    for tick in range(50):
+        source.remove_window(hwnds[tick])
+        source.add_window(f"New window {tick}", pid=1000 + tick % 17)
+        records = source.snapshot()
+        groups.sync(records, key_of)
+        groups.ordered({record.hwnd: record for record in records})
+    result["churn_ms_per_tick"] = (time.perf_counter() - start) / 50 * 1e3
+    result["image_path_lookups"] = source.calls["QueryFullProcessImageName"]
+
+    ordered = groups.ordered({record.hwnd: record for record in source.snapshot()})
+    result["rows_expanded"] = len(groups.rows(ordered))
+    for key in list(groups.groups):
+        groups.set_collapsed(key, True)
+    result["rows_collapsed"] = len(groups.rows(ordered))
+    return result
+
+
+@benchmark
+def bench_ordering():
+    # Position lookups and drag moves on 10,000 keys
+    order = OrderedKeys(range(10000))
+    start = time.perf_counter()
+    for i in range(10000):
+        order.index((i * 7919) % 10000)
+    result = {"index_us": (time.perf_counter() - start) / 10000 * 1e6}
+    start = time.perf_counter()
+    for i in range(10000):
+        order.move_to((i * 7919) % 10000, (i * 104729) % 10000)
+    result["move_us"] = (time.perf_counter() - start) / 10000 * 1e6
+    # Per-process fallback keys are not saved
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "order.json")
+        save_order(OrderedKeys(["C:\\a.exe", "pid:42", "C:\\b.exe"]), path)
+        result["saved_keys"] = load_order(path).keys
+    assert result["saved_keys"] == ["C:\\a.exe", "C:\\b.exe"], result["saved_keys"]
+    return result
+
+
+@benchmark
+def bench_hotkeys():
+    # 10,000 synthetic Win+N presses against a fake activation backend, with the order changing every 100
+    activated = []
+    dispatcher = HotkeyDispatcher(activated.append)
+    hwnds = list(range(0x1000, 0x1000 + 40))
+    rewrites = 0
+    start = time.perf_counter()
+    for press in range(10000):
+        if press % 100 == 0:
+            hwnds.insert(0, hwnds.pop(press % 40))
+            rewrites += dispatcher.table.update(hwnds[:10])
+        dispatcher.dispatch(press % 10)
+    result = dispatcher.stats()
+    result["us_per_press"] = (time.perf_counter() - start) / 10000 * 1e6
+    result["slot_writes"] = rewrites
+    return result
+
+
+@benchmark
+def bench_foreground():
+    # Scripted focus/minimize events for 20 windows, checking each click decision against the script
+    tracker = ForegroundTracker()
+    hwnds = list(range(0x2000, 0x2000 + 20))
+    for hwnd in hwnds:
+        tracker.seed_window(hwnd, hwnd % 4 == 0)
+    wrong = 0
+    events = 0
+    start = time.perf_counter()
+    for step in range(10000):
+        hwnd = hwnds[step * 7 % 20]
+        if step % 3 == 0:
+            tracker.on_event(EVENT_SYSTEM_FOREGROUND, hwnd)
+            expected = MINIMIZE
+        elif step % 3 == 1:
+            tracker.on_event(EVENT_SYSTEM_MINIMIZESTART, hwnd)
+            expected = RESTORE
+        else:
+            tracker.on_event(EVENT_SYSTEM_MINIMIZEEND, hwnd)
+            expected = MINIMIZE if hwnd == tracker.foreground else ACTIVATE
+        events += 1
+        action = tracker.toggle_action(hwnd)
+        wrong += action != expected
+        tracker.note_action(hwnd, action)
+    return {
+        "events": events,
+        "wrong_decisions": wrong,
+        "us_per_event_and_click": (time.perf_counter() - start) / events * 1e6,
+    }
+
+
+@benchmark
+def bench_instruments():
+    # Cost of a stage around a refresh of 50 windows, with instrumentation off and on
+    source = make_desktop(50, 0)
+    result = {}
+    for enabled in (False, True):
+        instruments = Instruments(enabled=enabled)
+        instruments.add_source("windows", source.stats)
+        start = time.perf_counter()
+        for _ in range(2000):
+            with instruments.stage("snapshot"):
+                source.snapshot()
+        label = "enabled" if enabled else "disabled"
+        result[f"{label}_us_per_refresh"] = (time.perf_counter() - start) / 2000 * 1e6
+        report = instruments.report()
+    result["bare_stage_ns_disabled"] = stage_cost(Instruments(enabled=False))
+    result["bare_stage_ns_enabled"] = stage_cost(Instruments(enabled=True))
+    result["report_p50_ms"] = report["stages"]["snapshot"]["p50_ms"]
+    result["report_windows_scanned"] = report["counters"]["windows"]["windows_scanned"]
+    # A percentile never reports more than the slowest sample
+    histogram = Histogram()
+    histogram.add(3.0)
+    result["p99_of_one_3ms_sample"] = histogram.percentile(0.99)
+    assert result["p99_of_one_3ms_sample"] == 3.0, result["p99_of_one_3ms_sample"]
+    return result
+
+
+def stage_cost(instruments, rounds=100000):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        with instruments.stage("empty"):
+            pass
+    return (time.perf_counter() - start) / rounds * 1e9
+
+
+@benchmark
+def bench_background():
+    # Darkened strip for a 4K screen from a 4K wallpaper: rendered, reloaded from the disk cache, found in memory
+    qt_app()
+    from PyQt5.QtGui import QColor, QImage, QPainter, QLinearGradient
+    directory = tempfile.mkdtemp(prefix="pytaskbar-bench-")
+    wallpaper = QImage(3840, 2160, QImage.Format_RGB32)
+    painter = QPainter(wallpaper)
+    gradient = QLinearGradient(0, 0, 3840, 2160)
+    gradient.setColorAt(0, QColor("darkblue"))
+    gradient.setColorAt(1, QColor("orange"))
+    painter.fillRect(wallpaper.rect(), gradient)
+    painter.end()
+    path = os.path.join(directory, "wallpaper.jpg")
+    wallpaper.save(path)
+    key = background_key(path, (3840, 2160), (0, 0, 96, 2112), 1.0)
+
+    start = time.perf_counter()
+    image = render_strip(key)
+    render_ms = (time.perf_counter() - start) * 1000
+
+    delivered = []
+    renderer = BackgroundRenderer(lambda key, image: delivered.append(image), os.path.join(directory, "cache"))
+    renderer.load(key)  # Renders and writes the cache file
+    start = time.perf_counter()
+    renderer.load(key)
+    disk_ms = (time.perf_counter() - start) * 1000
+    renderer.finished(key, delivered[-1])
+    start = time.perf_counter()
+    for _ in range(1000):
+        renderer.lookup(background_key(path, (3840, 2160), (0, 0, 96, 2112), 1.0))
+    memory_us = (time.perf_counter() - start) / 1000 * 1e6
+    # A slideshow changes the wallpaper's mtime over and over; the disk cache keeps only the newest files
+    for change in range(1, 21):
+        renderer.load(key._replace(mtime=key.mtime + change))
+    cache_files = len(os.listdir(renderer.cache_dir))
+    assert cache_files == renderer.max_disk_entries, cache_files
+    assert os.path.exists(renderer.cache_path(key._replace(mtime=key.mtime + 20)))
+    renderer.shutdown()
+
+    # A render that raises is still delivered, so its key leaves `pending` and can be asked for again
+    blocker = os.path.join(directory, "not-a-directory")
+    open(blocker, "w").close()
+    failed = []
+    broken = BackgroundRenderer(lambda key, image: failed.append(image), blocker)
+    broken.pending.add(key)
+    broken.load(key)
+    broken.finished(key, failed[-1])
+    broken.shutdown()
+    assert len(failed) == 1 and not broken.pending, (failed, broken.pending)
+    return {
+        "strip_size": f"{image.width()}x{image.height()}",
+        "render_ms": render_ms,
+        "disk_cache_ms": disk_ms,
+        "memory_cache_us": memory_us,
+        "disk_hits": renderer.disk_hits,
+        "cache_files_after_21_wallpapers": cache_files,
+        "failed_render_errors": broken.errors,
+    }
+
+
+def start_bar(desktop, event_driven=True, startup=None, monitors=None, instruments=None, rules=None):
+    # The real bars on a simulated desktop, one per named monitor; the saved program order is kept out of it
+    app = qt_app()
+    os.environ["APPDATA"] = tempfile.mkdtemp(prefix="pytaskbar-bench-")
+    import bar
+    from taskbar_model import TaskbarModel
+    # There is one offscreen screen, so every bar sits on it and only the monitor names differ
+    model = TaskbarModel(event_driven=event_driven, desktop=desktop, startup=startup, instruments=instruments, rules=rules)
+    for monitor in monitors or list(desktop.monitors)[:1]:
+        bar.FixedWindowApp(model, app.primaryScreen(), monitor).show()
+    model.startup.mark("shell_shown")
+    model.setup_shell_hook(int(model.bars[0].winId()))
+    return app, model
+
+
+def stop_bar(model):
+    # Timers of a closed model may still fire later in the run, so it keeps no bars to update
+    model.close()
+    bars, model.bars = model.bars, []
+    for bar in bars:
+        bar.deleteLater()
+
+
+def pump(app, seconds):
+    # Run the event loop for a while so timers and icon deliveries fire; it sleeps when there is nothing to do
+    from PyQt5.QtCore import QEventLoop, QTimer
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
+
+
+def percentiles(samples, prefix):
+    samples = sorted(samples)
+    return {
+        f"{prefix}_p50": samples[len(samples) // 2],
+        f"{prefix}_p90": samples[len(samples) * 9 // 10],
+        f"{prefix}_p99": samples[len(samples) * 99 // 100],
+        f"{prefix}_max": samples[-1],
+    }
+
+
+def churn_step(desktop, rng, live):
+    # One scripted tick: mostly title churn, some windows coming and going, the odd hang or new icon
+    roll = rng.random()
+    if roll < 0.4:
+        hwnd = rng.choice(live)
+        desktop.retitle(hwnd, f"{rng.choice(TITLE_CORPUS)} ({rng.randrange(100)})")
+    elif roll < 0.55 or len(live) < 20:
+        live.append(desktop.create_window(rng.choice(TITLE_CORPUS), pid=1000 + rng.randrange(17)))
+    elif roll < 0.7:
+        desktop.destroy_window(live.pop(rng.randrange(len(live))))
+    elif roll < 0.75:
+        desktop.hang(rng.choice(live), rng.random() < 0.5)
+    elif roll < 0.85:
+        desktop.set_icon(rng.choice(live), rng.randrange(1, 40))
+
+
+def simulated_desktop(count, rng):
+    desktop = SimulatedDesktop()
+    live = [desktop.create_window(rng.choice(TITLE_CORPUS), pid=1000 + i % 17) for i in range(count)]
+    return desktop, live
+
+
+@benchmark
+def bench_desktop_churn():
+    # 500 scripted ticks against the full bar, refreshed once per tick as the poll timer would
+    rng = random.Random(1)
+    desktop, live = simulated_desktop(60, rng)
+    app, model = start_bar(desktop, event_driven=False)
+    pump(app, 0.1)
+    latencies = []
+    touched = []
+    for tick in range(500):
+        churn_step(desktop, rng, live)
+        rebinds = model.bars[0].taskbar_list.rebinds
+        start = time.perf_counter()
+        model.update_taskbar_buttons()
+        latencies.append((time.perf_counter() - start) * 1000)
+        touched.append(model.bars[0].taskbar_list.rebinds - rebinds)
+        app.processEvents()  # Deliver fetched icons
+    result = percentiles(latencies, "refresh_ms")
+    result.update(percentiles(touched, "widgets_touched_per_tick"))
+    result["widgets_created"] = model.bars[0].taskbar_list.widgets_created
+    stop_bar(model)
+    return result
+
+
+@benchmark
+def bench_offbar_events():
+    # Events of windows that are not on the bar: a tool window showing progress in its title, one
+    # shown over and over, and a hidden window renamed; none of them should cost a rescan
+    from window_rules import WS_EX_TOOLWINDOW
+    from event_source import EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_SHOW
+    rng = random.Random(3)
+    desktop, live = simulated_desktop(20, rng)
+    app, model = start_bar(desktop)
+    source = desktop.window_source
+    tool = source.add_window("Copying 0%", ex_style=WS_EX_TOOLWINDOW)
+    hidden = source.add_window("Worker", visible=False)
+    desktop.event_source.emit(EVENT_OBJECT_SHOW, tool)
+    pump(app, 0.2)
+    snapshots = source.snapshots
+    for percent in range(1, 101):
+        source.set_title(tool, f"Copying {percent}%")
+        desktop.event_source.emit(EVENT_OBJECT_NAMECHANGE, tool)
+        desktop.event_source.emit(EVENT_OBJECT_SHOW, tool)
+        source.set_title(hidden, f"Worker {percent}")
+        desktop.event_source.emit(EVENT_OBJECT_NAMECHANGE, hidden)
+        pump(app, 0.001)
+    pump(app, 0.2)
+    result = {"events": 300, "snapshots": source.snapshots - snapshots, "dropped": model.event_router.dropped}
+    # A window without a title yet still gets its rescan when it gains one
+    untitled = source.add_window("")
+    desktop.event_source.emit(EVENT_OBJECT_SHOW, untitled)
+    pump(app, 0.2)
+    source.set_title(untitled, "Now titled")
+    desktop.event_source.emit(EVENT_OBJECT_NAMECHANGE, untitled)
+    pump(app, 0.2)
+    result["titled_window_shown"] = untitled in model.windows
+    # Off-bar windows that come and go leave nothing cached behind, and a reused hwnd is judged afresh
+    for _ in range(1000):
+        shell = source.add_window("Program Manager", class_name="Progman")
+        desktop.event_source.emit(EVENT_OBJECT_SHOW, shell)
+        model.update_taskbar_buttons()
+        desktop.destroy_window(shell)
+    result["cached_classes_after_1000_cycles"] = len(source.filter.class_names)
+    assert result["cached_classes_after_1000_cycles"] <= len(model.windows) + 2, result
+    source.add_window("Untitled - Notepad", class_name="Notepad", hwnd=shell)
+    desktop.event_source.emit(EVENT_OBJECT_SHOW, shell)
+    pump(app, 0.2)
+    result["reused_hwnd_shown"] = shell in model.windows
+    assert result["titled_window_shown"] and result["reused_hwnd_shown"], result
+    stop_bar(model)
+    return result
+
+
+@benchmark
+def bench_desktop_memory():
+    # 5,000 ticks of churn; growth between tick 500 and the end should be flat
+    import psutil
+    process = psutil.Process()
+    rng = random.Random(2)
+    desktop, live = simulated_desktop(60, rng)
+    app, model = start_bar(desktop, event_driven=False)
+    for tick in range(5000):
+        churn_step(desktop, rng, live)
+        model.update_taskbar_buttons()
+        app.processEvents()
+        if tick == 500:
+            gc.collect()
+            rss, objects = process.memory_info().rss, len(gc.get_objects())
+    gc.collect()
+    result = {
+        "rss_growth_kb": (process.memory_info().rss - rss) // 1024,
+        "python_objects_growth": len(gc.get_objects()) - objects,
+        "icon_cache_entries": model.icon_cache.stats()["entries"],
+        "elide_cache_entries": model.text_elider.stats()["entries"],
+    }
+    stop_bar(model)
+    return result
+
+
+@benchmark
+def bench_desktop_idle():
+    # CPU the event-driven bar burns on an unchanging desktop once the reconcile sweep has backed off to
+    # its longest interval. The sweep runs on a FakeClock: the event loop is measured for a few real
+    # seconds without it, and the sweeps of a steady-state minute are measured on their own
+    rng = random.Random(3)
+    desktop, live = simulated_desktop(60, rng)
+    app, model = start_bar(desktop, event_driven=True)
+    sweep = model.reconcile_sweep
+    clock = FakeClock()
+    sweep.schedule = clock.schedule
+    pump(app, sweep.minimum + 0.5)  # The first icons arrive, and the first sweep hands over to the fake clock
+    while sweep.interval < sweep.maximum:
+        clock.advance(1.0)
+    pump(app, 0.2)
+
+    seconds = 5.0
+    cpu = time.process_time()
+    refreshes = model.window_source.snapshots
+    rebinds = model.bars[0].taskbar_list.rebinds
+    pump(app, seconds)
+    loop_cpu = (time.process_time() - cpu) * 60 / seconds
+    loop_snapshots = (model.window_source.snapshots - refreshes) * 60 / seconds
+
+    sweeps = sweep.sweeps
+    cpu = time.process_time()
+    refreshes = model.window_source.snapshots
+    for _ in range(60):
+        clock.advance(1.0)
+    sweep_cpu = time.process_time() - cpu
+    result = {
+        "sweep_interval_s": sweep.interval,
+        "sweeps_per_idle_minute": sweep.sweeps - sweeps,
+        "cpu_ms_per_idle_minute": (loop_cpu + sweep_cpu) * 1000,
+        "snapshots_per_idle_minute": loop_snapshots + model.window_source.snapshots - refreshes,
+        "widgets_touched": model.bars[0].taskbar_list.rebinds - rebinds,
+    }
+    assert result["sweep_interval_s"] == sweep.maximum and result["sweeps_per_idle_minute"] == 2, result
+    stop_bar(model)
+    return result
+
+
+@benchmark
+def bench_startup():
+    # Import cost in a fresh interpreter, then time to first paint and to a complete bar with 60 windows
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    imports = []
+    for _ in range(3):
+        output = subprocess.run(
+            [sys.executable, "-c", "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"],
+            capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        imports.append(float(output.split()[-1]) * 1000)
+
+    from startup import StartupTimeline
+    rng = random.Random(4)
+    desktop, live = simulated_desktop(60, rng)
+    qt_app()
+    startup = StartupTimeline()
+    app, model = start_bar(desktop, startup=startup)
+    deadline = time.perf_counter() + 5
+    while "icons_loaded" not in startup.marks and time.perf_counter() < deadline:
+        pump(app, 0.01)
+    result = {"import_main_ms": min(imports)}
+    result.update({f"{name}_ms": ms for name, ms in startup.marks.items()})
+    stop_bar(model)
+    return result
+
+
+THREE_MONITORS = {
+    "DISPLAY1": (0, 0, 1920, 1080),
+    "DISPLAY2": (1920, 0, 4480, 1440),
+    "DISPLAY3": (-1080, -400, 0, 1520),  # Portrait, to the left and above
+}
+
+
+@benchmark
+def bench_monitors():
+    # 90 windows over three synthetic monitors: partition cost, and what a refresh costs with one bar and with three
+    from monitors import MonitorMap, partition
+    rng = random.Random(5)
+    desktop = SimulatedDesktop(THREE_MONITORS)
+    names = list(THREE_MONITORS)
+
+    def random_rect():
+        left, top, right, bottom = THREE_MONITORS[rng.choice(names)]
+        x, y = rng.randrange(left, right - 200), rng.randrange(top, bottom - 200)
+        return (x, y, x + rng.randrange(200, 1200), y + rng.randrange(200, 900))
+
+    live = [desktop.create_window(rng.choice(TITLE_CORPUS), pid=1000 + i % 17, rect=random_rect()) for i in range(90)]
+    rows = desktop.window_source.snapshot()
+    monitor_map = MonitorMap(desktop.window_monitor)
+    partition(rows, monitor_map.get, names)
+    start = time.perf_counter()
+    for _ in range(1000):
+        parts = partition(rows, monitor_map.get, names)
+    result = {"partition_us": (time.perf_counter() - start) * 1000, "rows_per_monitor": "/".join(str(len(parts[name])) for name in names)}
+
+    for bar_count in (1, 3):
+        app, model = start_bar(desktop, event_driven=False, monitors=names[:bar_count])
+        pump(app, 0.1)
+        snapshots, lookups = desktop.window_source.snapshots, model.monitors.lookups
+        latencies = []
+        for tick in range(300):
+            if tick % 3 == 0:
+                desktop.move_window(rng.choice(live), random_rect())
+            else:
+                desktop.retitle(rng.choice(live), f"{rng.choice(TITLE_CORPUS)} ({rng.randrange(100)})")
+            start = time.perf_counter()
+            model.update_taskbar_buttons()
+            latencies.append((time.perf_counter() - start) * 1000)
+            app.processEvents()
+        result.update(percentiles(latencies, f"refresh_{bar_count}_bars_ms"))
+        result[f"snapshots_per_refresh_{bar_count}_bars"] = (desktop.window_source.snapshots - snapshots) / 300
+        result[f"monitor_lookups_per_refresh_{bar_count}_bars"] = (model.monitors.lookups - lookups) / 300
+        # Every window is on exactly one bar; with one bar the other monitors fall back to it
+        result[f"rows_shown_{bar_count}_bars"] = sum(len(bar.taskbar_list.rows) for bar in model.bars)
+        stop_bar(model)
+
+    # A window a program moves sends no event we hook; the reconcile sweep moves it to the other bar
+    app, model = start_bar(desktop, monitors=names)
+    pump(app, 0.1)
+    hwnd = live[0]
+    target = next(name for name in names if name != model.monitors.get(hwnd))
+    left, top = THREE_MONITORS[target][:2]
+    desktop.move_window(hwnd, (left + 100, top + 100, left + 900, top + 700), dragged=False)
+    result["program_move_drift"] = model.reconcile()
+    pump(app, 0.1)
+    result["program_move_on_target_bar"] = any(
+        bar.monitor == target and any(row.hwnd == hwnd for row in bar.taskbar_list.rows) for bar in model.bars)
+    assert result["program_move_drift"] and result["program_move_on_target_bar"], result
+    stop_bar(model)
+    return result
+
+
+@benchmark
+def bench_screen_changes():
+    # Screens removed under a running shell: the bar of a removed screen is retired while another bar is
+    # left, the last one is parked when no screen is left and comes back on the next screen added
+    app = qt_app()
+    os.environ["APPDATA"] = tempfile.mkdtemp(prefix="pytaskbar-bench-")
+    import bar
+    from taskbar_model import TaskbarModel
+    desktop = SimulatedDesktop()
+    model = TaskbarModel(desktop=desktop)
+    # Offscreen Qt has one screen that never goes away, so a second bar sits on it under a stand-in key
+    screen = app.primaryScreen()
+    screen_bars = bar.ScreenBars(app, model, [screen])
+    model.setup_shell_hook(int(screen_bars.bars[screen].winId()))
+    other = screen_bars.bars["DISPLAY2"] = bar.FixedWindowApp(model, screen, "DISPLAY2")
+    other.show()
+    pump(app, 0.2)
+    result = {"bars": len(model.bars), "app_bars": len(desktop.app_bars)}
+
+    # The first bar holds the shell hook; it moves to the bar that is left
+    first = screen_bars.bars[screen]
+    screen_bars.screen_removed(screen)
+    result["bars_after_removing_one"] = len(model.bars)
+    result["app_bars_after_removing_one"] = len(desktop.app_bars)
+    result["shell_hook_moved"] = model.hwnd == int(other.winId())
+    # The last bar follows the primary screen instead of holding on to a removed one
+    screen_bars.screen_removed("DISPLAY2")
+    result["last_bar_rehomed"] = screen_bars.bars.get(screen) is other and other.bar_screen is screen
+    result["app_bars_after_rehoming"] = len(desktop.app_bars)
+    # The stand-in for "no screen left": the only screen Qt reports is the removed one
+    screen_bars.screen_removed(screen)
+    result["parked"] = screen_bars.parked is other and not other.isVisible()
+    result["app_bars_while_parked"] = len(desktop.app_bars)
+    screen_bars.screen_added(screen)
+    pump(app, 0.2)
+    result["back_on_added_screen"] = screen_bars.bars.get(screen) is other and other.isVisible()
+    result["app_bars_after_screen_added"] = len(desktop.app_bars)
+    assert (result["bars"], result["app_bars"]) == (2, 2), result
+    assert (result["bars_after_removing_one"], result["app_bars_after_removing_one"]) == (1, 1), result
+    assert result["shell_hook_moved"] and first not in model.bars, result
+    assert result["last_bar_rehomed"] and result["app_bars_after_rehoming"] == 1, result
+    assert result["parked"] and result["app_bars_while_parked"] == 0, result
+    assert result["back_on_added_screen"] and result["app_bars_after_screen_added"] == 1, result
+    stop_bar(model)
+    return result
+
+
+@benchmark
+def bench_layout():
+    # Layout math over common work areas and scales: no overlaps, no parts outside the bar, the expected deltas
+    # and AppBar rectangles in physical pixels
+    from layout import BUTTON_HEIGHT, TASKBAR_SIZE, LayoutInputs, changed_parts, compute_layout
+
+    def overlaps(a, b):
+        return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+    cases = [LayoutInputs(left, 0, top, height, ratio, TASKBAR_SIZE, BUTTON_HEIGHT)
+             for left in (0, 1920, -1080) for top in (0, 40) for height in (720, 1032, 1392, 2112) for ratio in (1.0, 1.25, 1.5, 2.0)]
+    overlapping = outside = 0
+    for inputs in cases:
+        layout = compute_layout(inputs)
+        # The background is behind everything else, so it is the one part allowed to overlap
+        rects = [rect for name, rect in layout.parts.items() if name != "background"]
+        overlapping += sum(overlaps(a, b) for i, a in enumerate(rects) for b in rects[i + 1:])
+        outside += sum(x < 0 or y < 0 or x + w > inputs.width or y + h > inputs.work_height
+                       for x, y, w, h in layout.parts.values())
+    assert overlapping == 0 and outside == 0, (overlapping, outside)
+
+    start = time.perf_counter()
+    for inputs in cases * 100:
+        compute_layout(inputs)
+    compute_us = (time.perf_counter() - start) * 1e6 / (len(cases) * 100)
+
+    base = LayoutInputs(0, 0, 0, 1032, 1.0, TASKBAR_SIZE, BUTTON_HEIGHT)
+    resized = compute_layout(base._replace(work_height=1392))
+    rescaled = compute_layout(base._replace(ratio=1.5))
+    moved = compute_layout(base._replace(screen_left=1920))
+    # Everything below the Windows button hangs from the bottom of the work area; DPI and position move no widget
+    assert set(changed_parts(None, compute_layout(base))) == set(compute_layout(base).parts)
+    assert set(changed_parts(compute_layout(base), resized)) == set(compute_layout(base).parts) - {"windows_key"}
+    assert changed_parts(compute_layout(base), rescaled) == [] and changed_parts(compute_layout(base), moved) == []
+    assert moved.window[:2] == (1920, 0) and moved.app_bar == (1920, 0, 2016, 1032), moved
+    # Each screen's origin is at its physical position; only offsets from it are scaled
+    app_bar_cases = [
+        (base, (0, 0, 96, 1032)),
+        (base._replace(ratio=1.5), (0, 0, 144, 1548)),
+        (LayoutInputs(1920, 0, 40, 1032, 1.5, TASKBAR_SIZE, BUTTON_HEIGHT), (1920, 60, 2064, 1608)),  # Right of a 1920 px primary
+        (LayoutInputs(-1080, -400, -400, 1032, 1.25, TASKBAR_SIZE, BUTTON_HEIGHT), (-1080, -400, -960, 890)),
+        (LayoutInputs(-1080, -400, -360, 1032, 2.0, TASKBAR_SIZE, BUTTON_HEIGHT), (-1080, -320, -888, 1744)),
+    ]
+    for inputs, expected in app_bar_cases:
+        assert compute_layout(inputs).app_bar == expected, (inputs, compute_layout(inputs).app_bar, expected)
+    secondary = app_bar_cases[2][1]
+
+    # A settled screen sends a burst of change signals; relayouts that change nothing must be cheap
+    app, model = start_bar(SimulatedDesktop())
+    bar = model.bars[0]
+    assert not bar.apply_layout()
+    start = time.perf_counter()
+    for _ in range(1000):
+        bar.apply_layout()
+    noop_us = (time.perf_counter() - start) * 1000
+    stop_bar(model)
+    return {
+        "cases": len(cases),
+        "overlapping_parts": overlapping,
+        "parts_outside_bar": outside,
+        "compute_us": compute_us,
+        "parts_moved_on_resize": len(changed_parts(compute_layout(base), resized)),
+        "parts_moved_on_dpi_change": len(changed_parts(compute_layout(base), rescaled)),
+        "app_bar_reissued_on_dpi_change": compute_layout(base).app_bar != rescaled.app_bar,
+        "parts_moved_on_screen_move": len(changed_parts(compute_layout(base), moved)),
+        "app_bar_secondary_150": secondary,
+        "noop_relayout_us": noop_us,
+    }
+
+
+@benchmark
+def bench_supervisor():
+    # Recover from an exception in a slot and hot-reload the UI layer; the model must come through untouched
+    from supervisor import Supervisor
+    rng = random.Random(6)
+    desktop, live = simulated_desktop(60, rng)
+    app, model = start_bar(desktop)
+    deadline = time.perf_counter() + 5
+    while "icons_loaded" not in model.startup.marks and time.perf_counter() < deadline:
+        pump(app, 0.01)
+    supervisor = Supervisor(app, model, None)
+    supervisor.start(watch=False)
+    bar = model.bars[0]
+    hwnd = int(bar.winId())
+    before = (id(model.icon_cache), model.icon_cache.stats()["entries"], model.window_snapshot, desktop.app_bar_messages)
+
+    def state_kept():
+        return (int(bar.winId()) == hwnd and len(bar.taskbar_list.rows) == len(model.window_snapshot)
+                and (id(model.icon_cache), model.icon_cache.stats()["entries"], model.window_snapshot, desktop.app_bar_messages) == before)
+
+    # What PyQt does with an exception that escapes a slot once sys.excepthook is replaced
+    logging.disable(logging.CRITICAL)
+    try:
+        raise RuntimeError("simulated failure in a slot")
+    except RuntimeError:
+        sys.excepthook(*sys.exc_info())
+    pump(app, 0.05)
+    recovered = state_kept()
+
+    reloaded = supervisor.reload()
+    reload_kept = state_kept() and type(bar) is sys.modules["bar"].FixedWindowApp
+    logging.disable(logging.NOTSET)
+    result = {
+        "recovered_state_kept": recovered,
+        "reloaded": reloaded,
+        "reload_state_kept": reload_kept,
+        "app_bar_messages_during_both": desktop.app_bar_messages - before[3],
+    }
+    result.update(supervisor.stats())
+    supervisor.stop()
+    stop_bar(model)
+    return result
+
+
+def record_churn_session(path, ticks=300):
+    # A session recorded from the bar while a script churns 40 windows, every 10 ms
+    from recording import SessionRecorder
+    rng = random.Random(8)
+    desktop, live = simulated_desktop(40, rng)
+    app, model = start_bar(desktop)
+    model.start_recording(SessionRecorder(path))
+    pump(app, 0.1)
+    for tick in range(ticks):
+        churn_step(desktop, rng, live)
+        pump(app, 0.01)
+    pump(app, 0.3)
+    recorded = {entry.hwnd: entry.title for entry in model.window_snapshot}
+    stop_bar(model)
+    return recorded
+
+
+def session_windows(entries):
+    # hwnd -> title after the last window change of a session
+    windows = {}
+    for entry in entries:
+        if entry[1] in ("S", "D"):
+            windows.update({hwnd: title for hwnd, title, ex_style, pid in entry[2]})
+        if entry[1] == "D":
+            for hwnd in entry[3]:
+                windows.pop(hwnd, None)
+            windows.update({hwnd: title for hwnd, title in entry[4]})
+        elif entry[1] == "T" and entry[2] in windows:
+            windows[entry[2]] = entry[3]
+    return windows
+
+
+@benchmark
+def bench_replay():
+    # Replay a recorded session (--session, or one recorded here from scripted churn) into a fresh bar
+    # at --speed, and report the refresh latency it caused and whether the bar ended where the recording did
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from recording import SessionReplay, read_session
+    path = RECORDED_SESSION
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="pytaskbar-session-"), "session.jsonl")
+        record_churn_session(path)
+    entries = read_session(path)
+    expected = session_windows(entries)
+
+    desktop = SimulatedDesktop()
+    app, model = start_bar(desktop, instruments=Instruments(enabled=True), rules=[])
+    loop = QEventLoop()
+    replay = SessionReplay(desktop, model, entries, speed=REPLAY_SPEED, finished=loop.quit)
+    start = time.perf_counter()
+    replay.start()
+    QTimer.singleShot(600 * 1000, loop.quit)
+    loop.exec_()
+    result = {
+        "recorded_s": entries[-1][0] if entries else 0.0,
+        "replay_s": time.perf_counter() - start,
+        "speed": REPLAY_SPEED,
+        "session_bytes": os.path.getsize(path),
+    }
+    pump(app, 0.5)  # The refresh of the last changes, and their icons
+    result.update(replay.stats())
+    result["kinds"] = "/".join(f"{kind}{sum(1 for entry in entries if entry[1] == kind)}" for kind in "SDTEHN")
+    refresh = model.instruments.histograms.get("refresh")
+    if refresh is not None:
+        summary = refresh.summary()
+        result.update({f"refresh_{key}": summary[key] for key in ("count", "p50_ms", "p99_ms", "max_ms")})
+    result["ends_as_recorded"] = {entry.hwnd: entry.title for entry in model.window_snapshot} == expected
+
+    # A burst followed by silence is on disk within FLUSH_INTERVAL, without a later entry to push it out
+    from recording import FLUSH_INTERVAL, SessionRecorder
+    burst_path = os.path.join(tempfile.mkdtemp(prefix="pytaskbar-session-"), "burst.jsonl")
+    recorder = SessionRecorder(burst_path)
+    for hwnd in range(3):
+        recorder.on_event(0x8002, hwnd)
+    pump(app, FLUSH_INTERVAL + 0.3)
+    with open(burst_path, encoding="utf-8") as f:
+        result["burst_entries_on_disk"] = sum(1 for _ in f)
+    assert result["burst_entries_on_disk"] == recorder.entries, (result["burst_entries_on_disk"], recorder.entries)
+    recorder.close()
+    stop_bar(model)
+    return result
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_result(result, baseline=None):
+    for key, value in result.items():
+        line = f"    {key:<40} {value:.2f}" if isinstance(value, float) else f"    {key:<40} {value}"
+        old = (baseline or {}).get(key)
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            change = f"{(value - old) / old * 100:+.1f}%" if old else "new"
+            line = f"{line:<60} was {old:.2f} ({change})" if isinstance(old, float) else f"{line:<60} was {old} ({change})"
+        print(line)
+
+
+def main(argv):
+    global RECORDED_WINDOWS, RECORDED_SESSION, REPLAY_SPEED
+    parser = argparse.ArgumentParser(description="Headless PyTaskBar benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--json", metavar="FILE", help="write the results to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="show each result next to the one saved in FILE")
+    parser.add_argument("--windows", metavar="FILE", help="window list for the enumeration benchmark")
+    parser.add_argument("--session", metavar="FILE", help="recorded session for the replay benchmark")
+    parser.add_argument("--speed", type=float, default=REPLAY_SPEED,
+                        help=f"replay speed, 0 for as fast as possible (default: {REPLAY_SPEED:g})")
+    args = parser.parse_args(argv)
+    RECORDED_WINDOWS, RECORDED_SESSION, REPLAY_SPEED = args.windows, args.session, args.speed
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    results = {}
+    for name in args.names or list(BENCHMARKS):
+        results[name] = BENCHMARKS[name]()
+        print(name)
+        print_result(results[name], baseline.get(name))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"commit": current_commit(), "python": sys.version.split()[0], "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,368 @@
+"""Everything the bar asks of the operating system, behind one object.
+
+FixedWindowApp never calls Win32 itself: it reads windows through
+`desktop.window_source`, listens to `desktop.event_source`, and goes
+through the methods below to activate windows, send keys, register
+hotkeys and the AppBar, and turn icon handles into pixmaps.
+
+Win32Desktop is the real thing. SimulatedDesktop is an in-memory desktop
+that scripts can drive (create, destroy, retitle, hang, change icons);
+it raises the same WinEvents Windows would, so the bar runs unmodified
+under the offscreen Qt platform for benchmarks.
+"""
+import ctypes
+import time
+from ctypes import wintypes
+
+from event_source import (
+    EVENT_OBJECT_DESTROY,
+    EVENT_OBJECT_NAMECHANGE,
+    EVENT_OBJECT_SHOW,
+    EVENT_SYSTEM_FOREGROUND,
+    EVENT_SYSTEM_MINIMIZEEND,
+    EVENT_SYSTEM_MINIMIZESTART,
+    EVENT_SYSTEM_MOVESIZEEND,
+    FakeEventSource,
+    Win32EventSource,
+)
+from hotkeys import HOTKEY_ID_BASE, MOD_NOREPEAT, MOD_WIN, slot_virtual_key
+from monitors import monitor_from_rect
+from window_source import FakeWindowSource, Win32WindowSource
+
+ABM_NEW = 0x00000000
+ABM_REMOVE = 0x00000001
+ABM_QUERYPOS = 0x00000002
+ABM_SETPOS = 0x00000003
+
+KEYEVENTF_KEYUP = 0x0002
+
+SPI_GETDESKWALLPAPER = 0x0073
+MAX_PATH = 260
+
+MONITOR_DEFAULTTONEAREST = 0x00000002
+
+
+class APPBARDATA(ctypes.Structure):
+    _fields_ = [
+        ("cbSize", wintypes.DWORD),
+        ("hWnd", wintypes.HWND),
+        ("uCallbackMessage", wintypes.UINT),
+        ("uEdge", wintypes.UINT),
+        ("rc", wintypes.RECT),
+        ("lParam", wintypes.LPARAM),
+    ]
+
+
+class MONITORINFOEXW(ctypes.Structure):
+    _fields_ = [
+        ("cbSize", wintypes.DWORD),
+        ("rcMonitor", wintypes.RECT),
+        ("rcWork", wintypes.RECT),
+        ("dwFlags", wintypes.DWORD),
+        ("szDevice", wintypes.WCHAR * 32),
+    ]
+
+
+class Desktop:
+    def __init__(self, window_source, event_source):
+        self.window_source = window_source
+        self.event_source = event_source
+
+    def tick_count(self):
+        # Milliseconds, on the same clock as the time of a window message
+        raise NotImplementedError
+
+    def foreground_window(self):
+        raise NotImplementedError
+
+    def is_minimized(self, hwnd):
+        raise NotImplementedError
+
+    def minimize(self, hwnd):
+        raise NotImplementedError
+
+    def restore(self, hwnd):
+        raise NotImplementedError
+
+    def activate(self, hwnd):
+        raise NotImplementedError
+
+    def press_keys(self, *keys):
+        # Press the virtual keys in order, release them in reverse
+        raise NotImplementedError
+
+    def register_shell_hook(self, bar_hwnd):
+        # Returns the shell hook message id, or None if shell hook messages are not available
+        raise NotImplementedError
+
+    def register_hotkeys(self, bar_hwnd, count):
+        # Registers Win+1.. for `count` slots; returns the slots that could not be registered
+        raise NotImplementedError
+
+    def unregister_hotkeys(self, bar_hwnd, count):
+        raise NotImplementedError
+
+    def register_app_bar(self, bar_hwnd, edge, left, top, right, bottom):
+        raise NotImplementedError
+
+    def remove_app_bar(self, bar_hwnd):
+        raise NotImplementedError
+
+    def window_monitor(self, hwnd):
+        # Device name of the monitor the window is on, or nearest to
+        raise NotImplementedError
+
+    def displays_changed(self):
+        # Monitors were added, removed or rearranged; drop anything cached about them
+        pass
+
+    def icon_pixmap(self, icon_handle):
+        raise NotImplementedError
+
+    def wallpaper_path(self):
+        # Path of the current wallpaper image, or None for a solid colour
+        raise NotImplementedError
+
+
+class Win32Desktop(Desktop):
+    def __init__(self):
+        super().__init__(Win32WindowSource(), Win32EventSource())
+        # Imported here so the module stays importable off Windows
+        import win32con
+        import win32gui
+        self.win32con = win32con
+        self.win32gui = win32gui
+        # A private WinDLL, so the prototypes set here do not leak into other users of windll
+        self.user32 = ctypes.WinDLL("user32")
+        self.user32.MonitorFromWindow.argtypes = [wintypes.HWND, wintypes.DWORD]
+        self.user32.MonitorFromWindow.restype = wintypes.HMONITOR
+        self.user32.GetMonitorInfoW.argtypes = [wintypes.HMONITOR, ctypes.POINTER(MONITORINFOEXW)]
+        self.shell32 = ctypes.windll.shell32
+        self.kernel32 = ctypes.windll.kernel32
+        self.app_bars = {}       # bar hwnd -> APPBARDATA
+        self.monitor_names = {}  # HMONITOR -> device name
+
+    def tick_count(self):
+        return self.kernel32.GetTickCount()
+
+    def foreground_window(self):
+        return self.win32gui.GetForegroundWindow()
+
+    def is_minimized(self, hwnd):
+        return bool(self.win32gui.IsIconic(hwnd))
+
+    def minimize(self, hwnd):
+        self.win32gui.ShowWindow(hwnd, self.win32con.SW_MINIMIZE)
+
+    def restore(self, hwnd):
+        self.win32gui.ShowWindow(hwnd, self.win32con.SW_RESTORE)
+
+    def activate(self, hwnd):
+        self.win32gui.SetForegroundWindow(hwnd)
+        self.win32gui.BringWindowToTop(hwnd)
+
+    def press_keys(self, *keys):
+        for key in keys:
+            self.user32.keybd_event(key, 0, 0, 0)
+        for key in reversed(keys):
+            self.user32.keybd_event(key, 0, KEYEVENTF_KEYUP, 0)
+
+    def register_shell_hook(self, bar_hwnd):
+        message = self.user32.RegisterWindowMessageW("SHELLHOOK")
+        if not self.user32.RegisterShellHookWindow(bar_hwnd):
+            return None
+        return message
+
+    def register_hotkeys(self, bar_hwnd, count):
+        # Explorer's own taskbar may already hold some of them
+        return [slot for slot in range(count)
+                if not self.user32.RegisterHotKey(bar_hwnd, HOTKEY_ID_BASE + slot, MOD_WIN | MOD_NOREPEAT, slot_virtual_key(slot))]
+
+    def unregister_hotkeys(self, bar_hwnd, count):
+        for slot in range(count):
+            self.user32.UnregisterHotKey(bar_hwnd, HOTKEY_ID_BASE + slot)
+
+    def register_app_bar(self, bar_hwnd, edge, left, top, right, bottom):
+        # Register the app as an AppBar to reserve screen space
+        appbar_data = self.app_bars.get(bar_hwnd)
+        if appbar_data is None:
+            appbar_data = self.app_bars[bar_hwnd] = APPBARDATA()
+            appbar_data.cbSize = ctypes.sizeof(APPBARDATA)
+            appbar_data.hWnd = bar_hwnd
+            self.shell32.SHAppBarMessage(ABM_NEW, ctypes.byref(appbar_data))
+        appbar_data.uEdge = edge
+        appbar_data.rc.left = left
+        appbar_data.rc.top = top
+        appbar_data.rc.right = right
+        appbar_data.rc.bottom = bottom
+
+        # Modify the AppBar position and settings with ABM_QUERYPOS and ABM_SETPOS
+        self.shell32.SHAppBarMessage(ABM_QUERYPOS, ctypes.byref(appbar_data))
+        self.shell32.SHAppBarMessage(ABM_SETPOS, ctypes.byref(appbar_data))
+
+    def remove_app_bar(self, bar_hwnd):
+        appbar_data = self.app_bars.pop(bar_hwnd, None)
+        if appbar_data is None:
+            return
+        # Reset the reserved area to allow windows to occupy the space again
+        appbar_data.rc.left = appbar_data.rc.top = 0
+        appbar_data.rc.right = appbar_data.rc.bottom = 0
+        self.shell32.SHAppBarMessage(ABM_SETPOS, ctypes.byref(appbar_data))
+        self.shell32.SHAppBarMessage(ABM_REMOVE, ctypes.byref(appbar_data))
+
+    def window_monitor(self, hwnd):
+        monitor = self.user32.MonitorFromWindow(hwnd, MONITOR_DEFAULTTONEAREST)
+        name = self.monitor_names.get(monitor)
+        if name is None:
+            info = MONITORINFOEXW()
+            info.cbSize = ctypes.sizeof(MONITORINFOEXW)
+            self.user32.GetMonitorInfoW(monitor, ctypes.byref(info))
+            name = self.monitor_names[monitor] = info.szDevice
+        return name
+
+    def displays_changed(self):
+        self.monitor_names.clear()
+
+    def icon_pixmap(self, icon_handle):
+        from PyQt5.QtWinExtras import QtWin
+        return QtWin.fromHICON(icon_handle)
+
+    def wallpaper_path(self):
+        buffer = ctypes.create_unicode_buffer(MAX_PATH)
+        if not self.user32.SystemParametersInfoW(SPI_GETDESKWALLPAPER, MAX_PATH, buffer, 0):
+            return None
+        return buffer.value or None
+
+
+class SimulatedDesktop(Desktop):
+    """In-memory desktop for benchmarks.
+
+    The script methods change the fake window list and raise the WinEvents
+    Windows would raise for the change. Operations the bar performs are
+    tallied in `actions`; icon handles turn into solid-colour pixmaps.
+    """
+
+    def __init__(self, monitors=None, clock=time.monotonic):
+        super().__init__(FakeWindowSource(), FakeEventSource())
+        self.clock = clock
+        # Monitor name -> (left, top, right, bottom); one 1920x1080 monitor unless given
+        self.monitors = dict(monitors or {"DISPLAY1": (0, 0, 1920, 1080)})
+        self.rects = {}  # hwnd -> (left, top, right, bottom)
+        self.foreground = None
+        self.minimized = set()
+        self.keys_pressed = []
+        self.hotkeys = set()
+        self.app_bars = {}  # bar hwnd -> (edge, left, top, right, bottom)
+        self.app_bar_messages = 0
+        self.wallpaper = None  # Image path the script can set
+        self.actions = 0
+        self.next_icon = 1
+
+    # Script side
+
+    def create_window(self, title, pid=1000, icon=None, minimized=False, rect=None):
+        hwnd = self.window_source.add_window(title, pid=pid)
+        if rect is None:
+            left, top = next(iter(self.monitors.values()))[:2]
+            rect = (left + 100, top + 100, left + 900, top + 700)
+        self.rects[hwnd] = rect
+        if icon is None:
+            icon, self.next_icon = self.next_icon, self.next_icon + 1
+        self.window_source.icons[hwnd] = icon
+        if minimized:
+            self.minimized.add(hwnd)
+        self.event_source.emit(EVENT_OBJECT_SHOW, hwnd)
+        return hwnd
+
+    def destroy_window(self, hwnd):
+        self.window_source.remove_window(hwnd)
+        self.window_source.hung.discard(hwnd)
+        self.minimized.discard(hwnd)
+        self.rects.pop(hwnd, None)
+        if self.foreground == hwnd:
+            self.foreground = None
+        self.event_source.emit(EVENT_OBJECT_DESTROY, hwnd)
+
+    def retitle(self, hwnd, title):
+        self.window_source.set_title(hwnd, title)
+        self.event_source.emit(EVENT_OBJECT_NAMECHANGE, hwnd)
+
+    def move_window(self, hwnd, rect, dragged=True):
+        # Only a move or resize by the user ends with an event; programs moving their windows send none we hook
+        self.rects[hwnd] = rect
+        if dragged:
+            self.event_source.emit(EVENT_SYSTEM_MOVESIZEEND, hwnd)
+
+    def hang(self, hwnd, hung=True):
+        if hung:
+            self.window_source.hung.add(hwnd)
+        else:
+            self.window_source.hung.discard(hwnd)
+
+    def set_icon(self, hwnd, icon):
+        self.window_source.icons[hwnd] = icon
+
+    def focus(self, hwnd):
+        self.minimized.discard(hwnd)
+        self.foreground = hwnd
+        self.event_source.emit(EVENT_SYSTEM_FOREGROUND, hwnd)
+
+    # Desktop side
+
+    def tick_count(self):
+        return int(self.clock() * 1000)
+
+    def foreground_window(self):
+        return self.foreground
+
+    def is_minimized(self, hwnd):
+        return hwnd in self.minimized
+
+    def minimize(self, hwnd):
+        self.actions += 1
+        self.minimized.add(hwnd)
+        if self.foreground == hwnd:
+            self.foreground = None
+        self.event_source.emit(EVENT_SYSTEM_MINIMIZESTART, hwnd)
+
+    def restore(self, hwnd):
+        self.actions += 1
+        self.minimized.discard(hwnd)
+        self.event_source.emit(EVENT_SYSTEM_MINIMIZEEND, hwnd)
+
+    def activate(self, hwnd):
+        self.actions += 1
+        self.focus(hwnd)
+
+    def press_keys(self, *keys):
+        self.keys_pressed.append(keys)
+
+    def register_shell_hook(self, bar_hwnd):
+        return 0xC000  # Never sent; changes arrive as WinEvents only
+
+    def register_hotkeys(self, bar_hwnd, count):
+        self.hotkeys = set(range(count))
+        return []
+
+    def unregister_hotkeys(self, bar_hwnd, count):
+        self.hotkeys = set()
+
+    def register_app_bar(self, bar_hwnd, edge, left, top, right, bottom):
+        self.app_bar_messages += 1
+        self.app_bars[bar_hwnd] = (edge, left, top, right, bottom)
+
+    def remove_app_bar(self, bar_hwnd):
+        self.app_bar_messages += 1
+        self.app_bars.pop(bar_hwnd, None)
+
+    def window_monitor(self, hwnd):
+        return monitor_from_rect(self.rects.get(hwnd, (0, 0, 0, 0)), self.monitors)
+
+    def icon_pixmap(self, icon_handle):
+        from PyQt5.QtGui import QColor, QPixmap
+        pixmap = QPixmap(16, 16)
+        pixmap.fill(QColor.fromHsv(icon_handle * 37 % 360, 200, 220))
+        return pixmap
+
+    def wallpaper_path(self):
+        return self.wallpaper
@@ -0,0 +1,49 @@
+"""Title elision for taskbar buttons.
+
+Only needs an object with a `width(text)` method (QFontMetrics in the app),
+so it can be benchmarked against any font backend.
+"""
+from collections import OrderedDict
+
+ELLIPSIS = "..."
+
+
+def elide_text(measure, title, width):
+    # Longest prefix that still fits together with the ellipsis. Prefix widths
+    # only grow with the prefix length, so a binary search needs O(log n) measurements.
+    if measure(title) <= width:
+        return title
+    low, high = 0, len(title) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if measure(title[:middle] + ELLIPSIS) <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return title[:low] + ELLIPSIS
+
+
+class TextElider:
+    """Memoizes elided titles per (font, width, title) in a bounded LRU."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def elide(self, font_metrics, font_key, title, width):
+        key = (font_key, width, title)
+        text = self.cache.get(key)
+        if text is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return text
+        self.misses += 1
+        text = self.cache[key] = elide_text(font_metrics.width, title, width)
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return text
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.cache)}
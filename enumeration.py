@@ -0,0 +1,154 @@
+"""Top-level windows read as columns.
+
+BatchedEnumerator does one EnumWindows pass whose callback only stores the
+hwnd in a preallocated ctypes array, then reads visibility, extended style
+and title in separate tight loops over those hwnds. The user32 functions
+are bound once with argtypes, extended styles are only read for visible
+windows, and titles are read straight into one reused unicode buffer, so
+a window costs one call per column instead of pywin32's fixed set.
+
+PyWin32Enumerator is the same enumeration through win32gui, one callback
+doing every call for every window. It is Win32WindowSource's default:
+the batched path makes fewer user32 calls but in most runs of
+`bench.py enumeration` spends more time in Python (about 12% more), so it
+is only used with batched=True until a measurement on Windows shows it
+winning.
+
+Both return a WindowColumns: how many windows were scanned and, for the
+visible ones, their hwnds, extended styles and titles as parallel lists.
+
+    python enumeration.py > windows.json
+
+records the current desktop for `python bench.py enumeration --windows windows.json`.
+"""
+from collections import namedtuple
+import json
+
+WindowColumns = namedtuple("WindowColumns", ["scanned", "hwnds", "ex_styles", "titles"])
+
+GWL_EXSTYLE = -20
+INITIAL_CAPACITY = 512  # Top-level windows; a busy desktop has a few hundred, most of them hidden
+TITLE_CAPACITY = 256    # Characters; grown for longer titles
+
+
+class BatchedEnumerator:
+    def __init__(self, user32, capacity=INITIAL_CAPACITY):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.user32 = user32
+        user32.EnumWindows.argtypes = [ctypes.c_void_p, wintypes.LPARAM]
+        user32.EnumWindows.restype = wintypes.BOOL
+        user32.IsWindowVisible.argtypes = [wintypes.HWND]
+        user32.IsWindowVisible.restype = wintypes.BOOL
+        user32.GetWindowLongW.argtypes = [wintypes.HWND, ctypes.c_int]
+        user32.GetWindowLongW.restype = ctypes.c_long
+        user32.GetWindowTextLengthW.argtypes = [wintypes.HWND]
+        user32.GetWindowTextLengthW.restype = ctypes.c_int
+        user32.GetWindowTextW.argtypes = [wintypes.HWND, wintypes.LPWSTR, ctypes.c_int]
+        user32.GetWindowTextW.restype = ctypes.c_int
+
+        self.allocate(capacity)
+        self.title_buffer = ctypes.create_unicode_buffer(TITLE_CAPACITY)
+        self.count = 0
+        self.overflowed = False
+        # The callback object has to outlive every EnumWindows call that uses it
+        proc_type = getattr(ctypes, "WINFUNCTYPE", ctypes.CFUNCTYPE)
+        self.callback = proc_type(wintypes.BOOL, ctypes.c_void_p, wintypes.LPARAM)(self.collect)
+        self.passes = 0
+        self.calls = 0
+
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.hwnds = (self.ctypes.c_void_p * capacity)()
+
+    def collect(self, hwnd, lparam):
+        if self.count == self.capacity:
+            self.overflowed = True
+            return False  # Stops the enumeration; enumerate() grows the array and starts over
+        self.hwnds[self.count] = hwnd
+        self.count += 1
+        return True
+
+    def enumerate(self):
+        user32 = self.user32
+        while True:
+            self.count = 0
+            self.overflowed = False
+            self.passes += 1
+            user32.EnumWindows(self.callback, 0)
+            if not self.overflowed:
+                break
+            self.allocate(self.capacity * 2)
+        scanned = self.count
+        is_visible = user32.IsWindowVisible
+        get_long = user32.GetWindowLongW
+        get_text = user32.GetWindowTextW
+
+        hwnds = [hwnd for hwnd in self.hwnds[:scanned] if is_visible(hwnd)]
+        ex_styles = [get_long(hwnd, GWL_EXSTYLE) for hwnd in hwnds]
+        titles = []
+        buffer = self.title_buffer
+        size = len(buffer)
+        for hwnd in hwnds:
+            length = get_text(hwnd, buffer, size)
+            if length == size - 1:
+                # Filled the buffer, so the title may be cut off
+                full = user32.GetWindowTextLengthW(hwnd)
+                if full >= size:
+                    buffer = self.title_buffer = self.ctypes.create_unicode_buffer(full + 1)
+                    size = len(buffer)
+                    length = get_text(hwnd, buffer, size)
+            titles.append(buffer.value if length else "")
+        self.calls += 1 + scanned + len(hwnds) * 2
+        return WindowColumns(scanned, hwnds, ex_styles, titles)
+
+    def stats(self):
+        return {"capacity": self.capacity, "passes": self.passes, "calls": self.calls}
+
+
+class PyWin32Enumerator:
+    def __init__(self, win32gui):
+        self.win32gui = win32gui
+        self.passes = 0
+        self.calls = 0
+
+    def enumerate(self):
+        win32gui = self.win32gui
+        scanned = 0
+        hwnds, ex_styles, titles = [], [], []
+
+        def enum_windows_callback(hwnd, extra):
+            nonlocal scanned
+            scanned += 1
+            ex_style = win32gui.GetWindowLong(hwnd, GWL_EXSTYLE)
+            if win32gui.IsWindowVisible(hwnd):
+                hwnds.append(hwnd)
+                ex_styles.append(ex_style)
+                titles.append(win32gui.GetWindowText(hwnd))
+            return True
+
+        self.passes += 1
+        win32gui.EnumWindows(enum_windows_callback, None)
+        self.calls += 1 + scanned * 2 + len(hwnds)
+        return WindowColumns(scanned, hwnds, ex_styles, titles)
+
+    def stats(self):
+        return {"passes": self.passes, "calls": self.calls}
+
+
+def recorded_windows(enumerator):
+    # [hwnd, ex_style, visible, title] per top-level window, the format bench.py replays.
+    # Hidden windows are kept so a replay pays for scanning them too.
+    columns = enumerator.enumerate()
+    visible = dict(zip(columns.hwnds, zip(columns.ex_styles, columns.titles)))
+    windows = []
+    for hwnd in enumerator.hwnds[:columns.scanned]:
+        ex_style, title = visible.get(hwnd, (0, ""))
+        windows.append([hwnd, ex_style, hwnd in visible, title])
+    return windows
+
+
+if __name__ == "__main__":
+    import ctypes
+    print(json.dumps(recorded_windows(BatchedEnumerator(ctypes.WinDLL("user32"))), ensure_ascii=False))
@@ -0,0 +1,144 @@
+"""WinEvent notifications about top-level windows.
+
+Win32EventSource installs out-of-context WinEvent hooks; the callbacks are
+delivered through the GUI thread's message loop, so listeners run on the Qt
+thread. FakeEventSource lets tests push the same events by hand.
+"""
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_SYSTEM_MOVESIZEEND = 0x000B
+EVENT_SYSTEM_MINIMIZESTART = 0x0016
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+
+WINDOW_EVENTS = [
+    EVENT_SYSTEM_FOREGROUND,
+    EVENT_SYSTEM_MOVESIZEEND,
+    EVENT_SYSTEM_MINIMIZESTART,
+    EVENT_SYSTEM_MINIMIZEEND,
+    EVENT_OBJECT_DESTROY,
+    EVENT_OBJECT_SHOW,
+    EVENT_OBJECT_HIDE,
+    EVENT_OBJECT_NAMECHANGE,
+]
+
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+GA_ROOT = 2
+
+
+class EventSource:
+    def __init__(self):
+        self.listeners = []
+
+    def subscribe(self, listener):
+        # listener(event, hwnd)
+        self.listeners.append(listener)
+
+    def emit(self, event, hwnd):
+        for listener in self.listeners:
+            listener(event, hwnd)
+
+    def start(self):
+        return True
+
+    def stop(self):
+        pass
+
+
+class FakeEventSource(EventSource):
+    pass
+
+
+class Win32EventSource(EventSource):
+    def __init__(self, events=WINDOW_EVENTS):
+        super().__init__()
+        self.events = list(events)
+        self.hooks = []
+        self.callback = None
+
+    def start(self):
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+
+        WINEVENTPROC = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+
+        def win_event_proc(hook, event, hwnd, id_object, id_child, thread_id, timestamp):
+            # Only whole top-level windows; child controls fire these events constantly
+            if not hwnd or id_object != OBJID_WINDOW or id_child != CHILDID_SELF:
+                return
+            if event != EVENT_OBJECT_DESTROY and user32.GetAncestor(hwnd, GA_ROOT) != hwnd:
+                return
+            if event == EVENT_OBJECT_NAMECHANGE and not user32.IsWindowVisible(hwnd):
+                return
+            self.emit(event, hwnd)
+
+        # Keep a reference, ctypes does not keep the callback alive by itself
+        self.callback = WINEVENTPROC(win_event_proc)
+        # One hook per event: a min..max range would also pull in location changes, sent for every cursor and caret move
+        for event in self.events:
+            hook = user32.SetWinEventHook(event, event, 0, self.callback, 0, 0,
+                                          WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+            if hook:
+                self.hooks.append(hook)
+        return len(self.hooks) == len(self.events)
+
+    def stop(self):
+        import ctypes
+        for hook in self.hooks:
+            ctypes.windll.user32.UnhookWinEvent(hook)
+        self.hooks = []
+
+
+class WindowEventRouter:
+    """Turns raw WinEvents into scheduler calls.
+
+    `is_tracked(hwnd)` tells whether the hwnd currently has a button, so
+    hides and destroys of unrelated windows do not cause rescans. For
+    windows without a button, the verdict `source.filter` cached in the
+    last enumeration decides: a window it left off the bar is not rescanned
+    when it is shown or focused again, or retitled, unless the new title
+    could change the verdict.
+    """
+
+    def __init__(self, scheduler, is_tracked, source):
+        self.scheduler = scheduler
+        self.is_tracked = is_tracked
+        self.source = source
+        self.dropped = 0
+
+    def __call__(self, event, hwnd):
+        if event == EVENT_OBJECT_SHOW:
+            # Windows are usually created hidden, showing is what puts them on the bar
+            if self.is_tracked(hwnd) or not self.source.filter.known_excluded(hwnd):
+                self.scheduler.window_changed(hwnd)
+            else:
+                self.dropped += 1
+        elif event in (EVENT_OBJECT_HIDE, EVENT_OBJECT_DESTROY):
+            if self.is_tracked(hwnd):
+                self.scheduler.window_changed(hwnd)
+            else:
+                self.source.filter.forget(hwnd)
+        elif event == EVENT_OBJECT_NAMECHANGE:
+            if self.is_tracked(hwnd):
+                self.scheduler.title_changed(hwnd)
+            elif self.source.filter.title_may_matter(hwnd):
+                self.scheduler.window_changed(hwnd)
+            else:
+                self.dropped += 1
+        elif event == EVENT_SYSTEM_FOREGROUND:
+            if not self.is_tracked(hwnd) and not self.source.filter.known_excluded(hwnd):
+                self.scheduler.window_changed(hwnd)
+
+    def stats(self):
+        return {"dropped": self.dropped}
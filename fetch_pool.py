@@ -0,0 +1,110 @@
+"""Icon handle fetching off the GUI thread.
+
+WM_GETICON has to be answered by the window's own thread, so a hung
+application would block whoever asks. IconFetchPool asks from a small
+worker pool through the provider's timeout-guarded call and hands results
+to `deliver(hwnd, icon_handle)` on the worker thread; the app connects that
+to a Qt signal so the conversion happens back on the GUI thread.
+
+`icon_handle` is None when the window did not answer in time or the call
+failed; every request gets an answer. Windows that time out are retried
+with exponential backoff and, after `hung_after` timeouts in a row,
+reported as not responding until they answer again.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("pytaskbar.icons")
+
+
+class IconFetchPool:
+    def __init__(self, provider, deliver, workers=2, timeout=0.25, backoff=1.0, max_backoff=60.0,
+                 hung_after=2, clock=time.monotonic):
+        self.provider = provider  # provider.fetch_icon_handle(hwnd, timeout) -> handle, raises TimeoutError
+        self.deliver = deliver
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hung_after = hung_after
+        self.clock = clock
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="icon-fetch")
+
+        self.lock = threading.Lock()
+        self.in_flight = set()
+        self.failures = {}   # hwnd -> timeouts in a row
+        self.retry_at = {}   # hwnd -> clock time of the next attempt
+        self.not_responding = set()
+
+        self.requests = 0
+        self.timeouts = 0
+        self.errors = 0  # Failures other than timeouts, e.g. a window destroyed mid-call
+
+    def request(self, hwnd):
+        with self.lock:
+            if hwnd in self.in_flight or self.retry_at.get(hwnd, 0) > self.clock():
+                return False
+            self.in_flight.add(hwnd)
+            self.requests += 1
+        self.executor.submit(self.fetch, hwnd)
+        return True
+
+    def fetch(self, hwnd):
+        # Always delivers, None on failure, so the window is never stuck in flight without an answer
+        icon_handle = None
+        try:
+            icon_handle = self.provider.fetch_icon_handle(hwnd, self.timeout)
+        except TimeoutError:
+            with self.lock:
+                self.timeouts += 1
+                self.note_failure(hwnd, timed_out=True)
+        except Exception:
+            log.exception("Fetching the icon of window %s failed", hwnd)
+            with self.lock:
+                self.errors += 1
+                self.note_failure(hwnd, timed_out=False)
+        else:
+            with self.lock:
+                self.failures.pop(hwnd, None)
+                self.retry_at.pop(hwnd, None)
+                self.not_responding.discard(hwnd)
+        finally:
+            with self.lock:
+                self.in_flight.discard(hwnd)
+            self.deliver(hwnd, icon_handle)
+
+    def note_failure(self, hwnd, timed_out):
+        # Called with the lock held; retried with backoff, and after a few timeouts reported as not responding
+        failures = self.failures[hwnd] = self.failures.get(hwnd, 0) + 1
+        self.retry_at[hwnd] = self.clock() + min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+        if timed_out and failures >= self.hung_after:
+            self.not_responding.add(hwnd)
+
+    def retry_due(self):
+        # Called from the refresh path; re-asks every window whose backoff has expired
+        now = self.clock()
+        with self.lock:
+            due = [hwnd for hwnd, when in self.retry_at.items() if when <= now]
+        for hwnd in due:
+            self.request(hwnd)
+
+    def is_not_responding(self, hwnd):
+        return hwnd in self.not_responding
+
+    def forget(self, hwnd):
+        with self.lock:
+            self.failures.pop(hwnd, None)
+            self.retry_at.pop(hwnd, None)
+            self.not_responding.discard(hwnd)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "not_responding": len(self.not_responding),
+        }
@@ -0,0 +1,70 @@
+"""Foreground and minimized state of taskbar windows.
+
+ForegroundTracker is fed WinEvents (EVENT_SYSTEM_FOREGROUND and the
+minimize start/end pair) and keeps the current foreground hwnd plus a
+minimized flag per window, so a button click can decide between minimize,
+restore and activate without asking Windows. The bar's own process is
+skipped by the hooks, so clicking the bar does not count as a focus change.
+"""
+from event_source import (
+    EVENT_OBJECT_DESTROY,
+    EVENT_SYSTEM_FOREGROUND,
+    EVENT_SYSTEM_MINIMIZEEND,
+    EVENT_SYSTEM_MINIMIZESTART,
+)
+
+MINIMIZE = "minimize"
+RESTORE = "restore"
+ACTIVATE = "activate"
+
+
+class ForegroundTracker:
+    def __init__(self):
+        self.foreground = None
+        self.minimized = set()
+        self.listeners = []  # listener(hwnd) when the foreground window changes
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def set_foreground(self, hwnd):
+        self.minimized.discard(hwnd)
+        if hwnd != self.foreground:
+            self.foreground = hwnd
+            for listener in self.listeners:
+                listener(hwnd)
+
+    def seed_window(self, hwnd, minimized):
+        # State of a window first seen after startup, before any event about it arrived
+        if minimized:
+            self.minimized.add(hwnd)
+        else:
+            self.minimized.discard(hwnd)
+
+    def on_event(self, event, hwnd):
+        if event == EVENT_SYSTEM_FOREGROUND:
+            self.set_foreground(hwnd)
+        elif event == EVENT_SYSTEM_MINIMIZESTART:
+            self.minimized.add(hwnd)
+            if hwnd == self.foreground:
+                self.set_foreground(None)
+        elif event == EVENT_SYSTEM_MINIMIZEEND:
+            self.minimized.discard(hwnd)
+        elif event == EVENT_OBJECT_DESTROY:
+            self.minimized.discard(hwnd)
+            if hwnd == self.foreground:
+                self.set_foreground(None)
+
+    def toggle_action(self, hwnd):
+        if hwnd == self.foreground:
+            return MINIMIZE
+        if hwnd in self.minimized:
+            return RESTORE
+        return ACTIVATE
+
+    def note_action(self, hwnd, action):
+        # Apply our own action right away; the events confirm it later
+        if action == MINIMIZE:
+            self.on_event(EVENT_SYSTEM_MINIMIZESTART, hwnd)
+        else:
+            self.set_foreground(hwnd)
@@ -0,0 +1,101 @@
+"""Groups taskbar windows by the program that owns them.
+
+GroupIndex maps a process image path to the ordered list of its windows.
+It is updated incrementally: each refresh only adds the hwnds it has not
+seen and drops the ones that are gone, so unchanged windows cost a dict
+lookup. Everything works on plain records with `hwnd`, `title` and `pid`.
+
+Groups are laid out in the order of an OrderedKeys of image paths, which
+the user can rearrange and which is persisted between runs; programs it
+has never seen are appended at the end.
+"""
+import os
+from collections import namedtuple
+
+from ordering import PROCESS_KEY_PREFIX, OrderedKeys
+
+# One row standing in for a collapsed group; `hwnd` is the window whose icon it shows
+GroupRow = namedtuple("GroupRow", ["key", "hwnd", "title", "count"])
+
+
+def app_name(image_path):
+    name = os.path.basename(image_path.replace("\\", "/"))
+    return os.path.splitext(name)[0] or image_path
+
+
+class GroupIndex:
+    def __init__(self, order=None):
+        self.order = order if order is not None else OrderedKeys()  # image paths, including programs not running now
+        self.groups = {}             # image path -> [hwnd, ...] in arrival order
+        self.group_of = {}           # hwnd -> image path
+        self.collapsed = set()       # image paths shown as a single row
+
+    def __len__(self):
+        return len(self.group_of)
+
+    def add(self, hwnd, key):
+        if hwnd in self.group_of:
+            return
+        self.group_of[hwnd] = key
+        self.groups.setdefault(key, []).append(hwnd)
+        if key not in self.order:
+            self.order.append(key)
+
+    def remove(self, hwnd):
+        key = self.group_of.pop(hwnd, None)
+        if key is None:
+            return
+        members = self.groups[key]
+        members.remove(hwnd)
+        if not members:
+            del self.groups[key]
+            if key.startswith(PROCESS_KEY_PREFIX):
+                self.order.remove(key)  # The process is gone, its key never comes back
+
+    def windows(self, key):
+        return list(self.groups.get(key, ()))
+
+    def sync(self, records, key_of):
+        # Bring the index in line with a snapshot; `key_of(record)` is only called for new windows
+        live = set()
+        for record in records:
+            live.add(record.hwnd)
+            if record.hwnd not in self.group_of:
+                self.add(record.hwnd, key_of(record))
+        for hwnd in [hwnd for hwnd in self.group_of if hwnd not in live]:
+            self.remove(hwnd)
+
+    def ordered(self, records_by_hwnd):
+        # Groups in the learned program order, windows of a group next to each other
+        groups = self.groups
+        return tuple(records_by_hwnd[hwnd] for key in self.order if key in groups for hwnd in groups[key])
+
+    def move_window(self, hwnd, target_hwnd):
+        # Drag and drop: within a program the window takes the target's place,
+        # across programs the whole program moves to the target program's place
+        key, target_key = self.group_of[hwnd], self.group_of[target_hwnd]
+        if key != target_key:
+            self.order.move_to(key, target_key)
+            return True
+        members = self.groups[key]
+        target_index = members.index(target_hwnd)
+        members.remove(hwnd)
+        members.insert(target_index, hwnd)
+        return False
+
+    def set_collapsed(self, key, collapsed):
+        if collapsed:
+            self.collapsed.add(key)
+        else:
+            self.collapsed.discard(key)
+
+    def rows(self, ordered_records):
+        # Display rows: window records, with each collapsed group folded into one GroupRow
+        rows = []
+        for record in ordered_records:
+            key = self.group_of.get(record.hwnd)
+            if key not in self.collapsed:
+                rows.append(record)
+            elif self.groups[key][0] == record.hwnd:
+                rows.append(GroupRow(key, record.hwnd, app_name(key), len(self.groups[key])))
+        return rows
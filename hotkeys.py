@@ -0,0 +1,72 @@
+"""Win+1..9, Win+0 switching to the first ten taskbar rows.
+
+SlotTable is refreshed from the row order whenever it changes, so a key
+press is a list lookup. HotkeyDispatcher activates the slot's window and
+keeps the key-down to activation latency. Neither knows about Win32: the
+app registers the hotkeys and feeds WM_HOTKEY into `dispatch`.
+"""
+import time
+from collections import deque
+
+WM_HOTKEY = 0x0312
+MOD_WIN = 0x0008
+MOD_NOREPEAT = 0x4000
+VK_0 = 0x30
+HOTKEY_ID_BASE = 0xB000  # Application hotkey ids live in 0x0000-0xBFFF
+
+SLOT_COUNT = 10
+
+
+def slot_virtual_key(slot):
+    # Like the Windows taskbar: Win+1 is the first row, Win+0 the tenth
+    return VK_0 + (slot + 1) % 10
+
+
+class SlotTable:
+    def __init__(self, size=SLOT_COUNT):
+        self.slots = [None] * size
+
+    def update(self, hwnds):
+        # Only slots whose window changed are written; returns how many that was
+        changed = 0
+        for slot in range(len(self.slots)):
+            hwnd = hwnds[slot] if slot < len(hwnds) else None
+            if self.slots[slot] != hwnd:
+                self.slots[slot] = hwnd
+                changed += 1
+        return changed
+
+    def lookup(self, slot):
+        return self.slots[slot] if 0 <= slot < len(self.slots) else None
+
+
+class HotkeyDispatcher:
+    def __init__(self, activate, table=None, clock=None, history=256):
+        self.activate = activate  # activate(hwnd)
+        self.table = table if table is not None else SlotTable()
+        self.clock = clock or (lambda: time.perf_counter() * 1000)  # milliseconds
+        self.latencies = deque(maxlen=history)
+        self.presses = 0
+        self.misses = 0
+
+    def dispatch(self, slot, pressed_at=None):
+        # `pressed_at` is the key-down time on the dispatcher's clock (WM_HOTKEY's message time)
+        if pressed_at is None:
+            pressed_at = self.clock()
+        self.presses += 1
+        hwnd = self.table.lookup(slot)
+        if hwnd is None:
+            self.misses += 1
+            return False
+        self.activate(hwnd)
+        self.latencies.append(self.clock() - pressed_at)
+        return True
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "presses": self.presses,
+            "misses": self.misses,
+            "latency_ms_p50": latencies[len(latencies) // 2] if latencies else None,
+            "latency_ms_max": latencies[-1] if latencies else None,
+        }
@@ -0,0 +1,78 @@
+"""LRU cache for converted window icons.
+
+Entries are keyed by (process image path, icon handle): windows of the same
+executable that share an icon share one converted pixmap. Each hwnd is bound
+to the key it resolved to, so a WM_SETICON-style change only needs to drop
+that binding. The cache never looks inside its values; `size_of` tells it
+how many bytes one costs.
+"""
+from collections import OrderedDict
+
+
+class IconCache:
+    def __init__(self, max_bytes=4 * 1024 * 1024, size_of=len):
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.entries = OrderedDict()  # key -> (value, size), least recently used first
+        self.bindings = {}            # hwnd -> key
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        size = self.size_of(value)
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+        if size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        self.entries[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.evictions += 1
+
+    def get_or_create(self, key, create):
+        value = self.get(key)
+        if value is None:
+            value = create()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def bind(self, hwnd, key):
+        self.bindings[hwnd] = key
+
+    def bound_key(self, hwnd):
+        return self.bindings.get(hwnd)
+
+    def invalidate_window(self, hwnd):
+        # The window changed its icon; the next lookup resolves a fresh key
+        self.bindings.pop(hwnd, None)
+
+    def invalidate(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+        for hwnd in [hwnd for hwnd, bound in self.bindings.items() if bound == key]:
+            del self.bindings[hwnd]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+        }
@@ -0,0 +1,220 @@
+"""Stage timers, latency histograms and periodic reports for the refresh loop.
+
+Code under measurement wraps a stage in `with instruments.stage("name"):`.
+While instrumentation is disabled that returns one shared do-nothing
+context manager, so the cost is an attribute check and a call. Counters
+are not duplicated here: components keep their own and expose `stats()`,
+which is registered with `add_source` and only read when a report is made.
+
+`report()` collects one interval into a plain dict, hands it to every sink
+and starts the next interval. Sinks are a rotating JSON-lines file and a
+localhost HTTP endpoint serving the latest report. IntervalProfiler runs
+cProfile over the GUI thread and dumps a .prof file per interval.
+"""
+import json
+import os
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency buckets, in milliseconds; the last bucket is open
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the percentile, never above the max; the open bucket reports the max
+        wanted = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                return min(BUCKET_BOUNDS_MS[index], self.max) if index < len(BUCKET_BOUNDS_MS) else self.max
+        return None
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "buckets": self.buckets,
+        }
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("histogram", "clock", "start")
+
+    def __init__(self, histogram, clock):
+        self.histogram = histogram
+        self.clock = clock
+
+    def __enter__(self):
+        self.start = self.clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.add((self.clock() - self.start) * 1000)
+        return False
+
+
+class Instruments:
+    def __init__(self, enabled=False, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.histograms = {}  # stage name -> Histogram for the current interval
+        self.sources = {}     # name -> stats() callable
+        self.sinks = []
+        self.interval_start = clock()
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return _Stage(histogram, self.clock)
+
+    def add_source(self, name, stats):
+        self.sources[name] = stats
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def report(self):
+        now = self.clock()
+        report = {
+            "time": time.time(),
+            "interval_s": round(now - self.interval_start, 3),
+            "stages": {name: histogram.summary() for name, histogram in self.histograms.items()},
+            "counters": {name: stats() for name, stats in self.sources.items()},
+        }
+        self.histograms = {}
+        self.interval_start = now
+        for sink in self.sinks:
+            sink.write(report)
+        return report
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+
+
+class JsonLinesSink:
+    # One report per line; the file is rotated to path.1, path.2, ... once it passes max_bytes
+    def __init__(self, path, max_bytes=1024 * 1024, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, report):
+        self.file.write(json.dumps(report, separators=(",", ":")) + "\n")
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self.file.close()
+
+
+class HttpSink:
+    # Serves the latest report as JSON on http://127.0.0.1:<port>/ from a daemon thread
+    def __init__(self, port):
+        # Imported here so a run without --stats-port does not load the HTTP stack
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.latest = b"{}"
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = sink.latest
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="instruments-http", daemon=True)
+        self.thread.start()
+
+    def write(self, report):
+        self.latest = json.dumps(report).encode("utf-8")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class IntervalProfiler:
+    """cProfile over the thread that starts it, written out as one .prof file per interval."""
+
+    def __init__(self, directory):
+        import cProfile
+        self.cProfile = cProfile
+        self.directory = directory
+        self.profile = cProfile.Profile()
+        self.intervals = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        self.profile.enable()
+
+    def dump(self, restart=True):
+        # Open the files with pstats or snakeviz; each covers only its own interval
+        self.profile.disable()
+        self.intervals += 1
+        path = os.path.join(self.directory, f"interval-{self.intervals:04d}.prof")
+        self.profile.dump_stats(path)
+        if restart:
+            self.profile = self.cProfile.Profile()
+            self.profile.enable()
+        return path
+
+    def stop(self):
+        return self.dump(restart=False)
@@ -0,0 +1,60 @@
+"""Where every part of a bar goes, computed from its screen.
+
+compute_layout() is pure: it turns a LayoutInputs (the screen's top-left
+corner, its work area, the device pixel ratio and the bar and button sizes) into a
+Layout of widget rectangles in bar coordinates, the bar's own position and
+the AppBar rectangle. Widget rectangles are in Qt's device-independent
+pixels; the AppBar rectangle is in physical pixels, which is what
+SHAppBarMessage expects. Qt puts each screen's origin at its physical
+position and scales only from there, so only offsets from the origin are
+multiplied by the device pixel ratio.
+
+When a screen changes, the bar computes a new Layout and applies only what
+differs from the old one (changed_parts), so widgets are moved, never
+rebuilt, and ABM_SETPOS is only re-issued if the reserved area moved.
+"""
+from collections import namedtuple
+
+TASKBAR_SIZE = 96
+BUTTON_HEIGHT = 32
+TRAY_ICON_SIZE = 24  # Volume and wifi sit side by side above the clock
+
+LayoutInputs = namedtuple("LayoutInputs", ["screen_left", "screen_top", "work_top", "work_height", "ratio", "width", "button_height"])
+Layout = namedtuple("Layout", ["window", "parts", "app_bar"])
+
+
+def screen_inputs(screen, width=TASKBAR_SIZE, button_height=BUTTON_HEIGHT):
+    # The bar hangs from the left edge of the whole screen; the work area leaves out other taskbars
+    available = screen.availableGeometry()
+    geometry = screen.geometry()
+    return LayoutInputs(geometry.left(), geometry.top(), available.top(), available.height(),
+                        screen.devicePixelRatio(), width, button_height)
+
+
+def compute_layout(inputs):
+    width, height, button = inputs.width, inputs.work_height, inputs.button_height
+    tray_top = height - button * 4 - 1
+    list_top = button + 5  # Start below the Windows button
+    parts = {
+        # (x, y, width, height) relative to the bar
+        "background": (0, 0, width, height),
+        "windows_key": (0, 0, width, button),
+        "window_list": (0, list_top, width, max(0, tray_top - list_top)),
+        "volume": (0, tray_top, TRAY_ICON_SIZE, TRAY_ICON_SIZE),
+        "wifi": (TRAY_ICON_SIZE, tray_top, TRAY_ICON_SIZE, TRAY_ICON_SIZE),
+        "clock": (0, height - button * 3 - 1, width, button * 2),
+        "close": (0, height - button - 1, width, button),
+        "show_desktop": (0, height - 1, width, 1),
+    }
+    window = (inputs.screen_left, inputs.work_top, width, height)
+    left, top, ratio = inputs.screen_left, inputs.screen_top, inputs.ratio
+    work_top = top + round((inputs.work_top - top) * ratio)
+    app_bar = (left, work_top, left + round(width * ratio), work_top + round(height * ratio))
+    return Layout(window, parts, app_bar)
+
+
+def changed_parts(old, new):
+    # Names of the parts whose rectangle differs; everything when there is no old layout
+    if old is None:
+        return list(new.parts)
+    return [name for name, rect in new.parts.items() if old.parts.get(name) != rect]
@@ -0,0 +1,84 @@
+"""Leveled logging that never writes from the GUI thread.
+
+Every module logs through `logging.getLogger("pytaskbar.<area>")`; the
+areas are bar, model, rules, windows, icons, background, supervisor and
+startup, and `--debug <area>` turns on DEBUG for one of them. The records
+go into a QueueHandler, which only appends to a queue; a QueueListener
+thread formats them and writes to stderr and, if asked, to a rotating
+file. A windowed PyInstaller build has no stderr and only gets the file.
+
+Per-window traces log to the "pytaskbar.windows" category at DEBUG. It
+is off unless named in `debug_categories`, and then it is rate limited, so
+a busy desktop cannot flood the queue.
+"""
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+ROOT = "pytaskbar"
+WINDOW_TRACE = ROOT + ".windows"
+
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket: lets `rate` records per second through, with bursts up to `burst`.
+
+    Dropped records are counted and reported on the next record let through.
+    """
+
+    def __init__(self, rate=20.0, burst=50, clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.last = clock()
+        self.dropped = 0
+
+    def filter(self, record):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < 1:
+            self.dropped += 1
+            return False
+        self.tokens -= 1
+        if self.dropped:
+            record.msg = f"{record.msg} ({self.dropped} earlier messages dropped)"
+            self.dropped = 0
+        return True
+
+
+def setup_logging(level=logging.WARNING, debug_categories=(), path=None, trace_rate=20.0):
+    """Install the queue handler; returns the listener, to be passed to shutdown_logging."""
+    handlers = []
+    if sys.stderr is not None:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    if path:
+        handlers.append(logging.handlers.RotatingFileHandler(path, maxBytes=1024 * 1024, backupCount=3, encoding="utf-8"))
+    formatter = logging.Formatter(FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger(ROOT)
+    root.setLevel(level)
+    root.propagate = False
+    root.addHandler(logging.handlers.QueueHandler(records))
+
+    for category in debug_categories:
+        logging.getLogger(f"{ROOT}.{category}").setLevel(logging.DEBUG)
+    # Per-window traces stay rate limited even when their category is on
+    logging.getLogger(WINDOW_TRACE).addFilter(RateLimitFilter(trace_rate))
+
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def shutdown_logging(listener):
+    # Writes out whatever is still queued
+    listener.stop()
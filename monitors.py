@@ -0,0 +1,87 @@
+"""Which monitor each window is on, and which bar shows it.
+
+MonitorMap caches the monitor of every window. It asks the desktop once
+per window and again only when a drag or restore ends or the reconcile
+sweep relocates them all, so a refresh costs a dict lookup per window
+however many bars there are.
+Monitors are identified by device name (\\\\.\\DISPLAY1), which is also
+QScreen.name() on Windows.
+
+partition() splits the shared row list between bars. Everything here
+works on plain rectangles, so synthetic geometries can drive it.
+"""
+
+def overlap_area(a, b):
+    # Rectangles are (left, top, right, bottom)
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    return width * height if width > 0 and height > 0 else 0
+
+
+def rect_distance(a, b):
+    dx = max(b[0] - a[2], a[0] - b[2], 0)
+    dy = max(b[1] - a[3], a[1] - b[3], 0)
+    return dx * dx + dy * dy
+
+
+def monitor_from_rect(rect, monitors):
+    # Like MonitorFromWindow with MONITOR_DEFAULTTONEAREST: the largest overlap, else the closest monitor
+    best, best_area = None, 0
+    for name, bounds in monitors.items():
+        area = overlap_area(rect, bounds)
+        if area > best_area:
+            best, best_area = name, area
+    if best is not None:
+        return best
+    return min(monitors, key=lambda name: rect_distance(rect, monitors[name]), default=None)
+
+
+def partition(rows, monitor_of, bar_monitors):
+    # Rows per bar monitor, in their shared order; windows on a monitor without a bar go to the first bar
+    parts = {monitor: [] for monitor in bar_monitors}
+    fallback = parts[bar_monitors[0]]
+    for row in rows:
+        parts.get(monitor_of(row.hwnd), fallback).append(row)
+    return parts
+
+
+class MonitorMap:
+    def __init__(self, locate):
+        self.locate = locate   # locate(hwnd) -> monitor name
+        self.monitor_of = {}   # hwnd -> monitor name
+        self.lookups = 0
+
+    def get(self, hwnd):
+        monitor = self.monitor_of.get(hwnd)
+        if monitor is None:
+            self.lookups += 1
+            monitor = self.monitor_of[hwnd] = self.locate(hwnd)
+        return monitor
+
+    def window_moved(self, hwnd):
+        # Returns True if a known window is now on another monitor
+        old = self.monitor_of.get(hwnd)
+        if old is None:
+            return False
+        self.lookups += 1
+        new = self.monitor_of[hwnd] = self.locate(hwnd)
+        return new != old
+
+    def relocate(self):
+        # Asks again for every known window; returns True if any is now on another monitor
+        moved = False
+        for hwnd, old in self.monitor_of.items():
+            self.lookups += 1
+            new = self.monitor_of[hwnd] = self.locate(hwnd)
+            moved = moved or new != old
+        return moved
+
+    def forget(self, hwnd):
+        self.monitor_of.pop(hwnd, None)
+
+    def clear(self):
+        # Monitors were added, removed or rearranged
+        self.monitor_of.clear()
+
+    def stats(self):
+        return {"windows": len(self.monitor_of), "lookups": self.lookups}
@@ -0,0 +1,110 @@
+"""User ordering of taskbar entries.
+
+OrderedKeys keeps keys in an order the user controls. Every key carries a
+numeric rank and the ranks are kept sorted, so finding a key's position is
+a bisect (O(log n)) and inserting or moving a key only gives it a rank
+between its new neighbours; nothing else is renumbered until two ranks get
+too close. The sorted lists are plain Python lists, whose insert and pop
+are a single memmove.
+
+The order of programs is saved to a small JSON file so it survives
+restarts; see load_order and save_order. Per-process fallback keys
+(PROCESS_KEY_PREFIX) are never saved.
+"""
+import json
+import os
+from bisect import bisect_left
+
+RANK_STEP = 1024.0
+# Fallback key of a process whose image path could not be read; it means nothing once the process is gone
+PROCESS_KEY_PREFIX = "pid:"
+
+
+class OrderedKeys:
+    def __init__(self, keys=()):
+        self.rank = {}   # key -> rank
+        self.ranks = []  # sorted ranks
+        self.keys = []   # keys, parallel to ranks
+        for key in keys:
+            self.append(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.rank
+
+    def __iter__(self):
+        return iter(list(self.keys))
+
+    def index(self, key):
+        return bisect_left(self.ranks, self.rank[key])
+
+    def append(self, key):
+        self.insert(key, len(self.keys))
+
+    def insert(self, key, index):
+        if key in self.rank:
+            self.remove(key)
+        index = max(0, min(index, len(self.keys)))
+        before = self.ranks[index - 1] if index > 0 else None
+        after = self.ranks[index] if index < len(self.ranks) else None
+        if before is None and after is None:
+            rank = 0.0
+        elif before is None:
+            rank = after - RANK_STEP
+        elif after is None:
+            rank = before + RANK_STEP
+        else:
+            rank = (before + after) / 2
+            if not before < rank < after:
+                # Ran out of room between the neighbours; spread everything out again
+                self.renumber()
+                return self.insert(key, index)
+        self.rank[key] = rank
+        position = bisect_left(self.ranks, rank)
+        self.ranks.insert(position, rank)
+        self.keys.insert(position, key)
+
+    def remove(self, key):
+        rank = self.rank.pop(key, None)
+        if rank is None:
+            return
+        position = bisect_left(self.ranks, rank)
+        del self.ranks[position]
+        del self.keys[position]
+
+    def move_to(self, key, target):
+        # `key` takes the place `target` has now; `target` shifts one step towards where `key` was
+        if key != target:
+            self.insert(key, self.index(target))
+
+    def renumber(self):
+        self.ranks = [index * RANK_STEP for index in range(len(self.keys))]
+        self.rank = dict(zip(self.keys, self.ranks))
+
+
+def order_file_path():
+    base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    return os.path.join(base, "PyTaskBar", "order.json")
+
+
+def load_order(path=None):
+    path = path or order_file_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return OrderedKeys(data.get("apps", []))
+    except (OSError, ValueError, AttributeError):
+        return OrderedKeys()
+
+
+def save_order(order, path=None):
+    path = path or order_file_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so a crash never leaves a half-written file behind
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        apps = [key for key in order.keys if not key.startswith(PROCESS_KEY_PREFIX)]
+        json.dump({"version": 1, "apps": apps}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, path)
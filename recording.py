@@ -0,0 +1,207 @@
+"""Sessions recorded from a running bar and replayed on a simulated desktop.
+
+`main.py --record FILE` appends what the model sees to FILE, one JSON
+array per line, t being seconds since the recording started:
+
+    [t, "R", version, unix time]                 a recording starts
+    [t, "S", [[hwnd, title, ex_style, pid], ...]]  the first snapshot, in enumeration order
+    [t, "D", added, removed, retitled]            a later snapshot that differs from the last one:
+                                                  added as in "S", removed hwnds, [hwnd, title] pairs
+    [t, "T", hwnd, title]                         a title read outside a snapshot that changed
+    [t, "E", event, hwnd]                         a WinEvent
+    [t, "H", wparam, lparam]                      a shell hook message
+    [t, "N", hwnd, 1 or 0]                        WM_GETICON timed out / answered again
+
+Unchanged snapshots and titles are not written, so an idle desktop adds
+nothing but its events. SessionReplay reads the first recording of a file
+back into a SimulatedDesktop and the model running on it, at the recorded
+pace or `speed` times faster (0: as fast as the event loop goes). Every
+window change is applied when the first event after the previous snapshot
+is replayed, because on the real desktop the window changed before the
+event that reported it, and the refresh reading it came later still.
+"""
+import json
+import time
+
+from PyQt5.QtCore import QTimer
+
+FORMAT_VERSION = 1
+FLUSH_INTERVAL = 1.0  # Seconds an entry may stay buffered; a crash loses at most this much of the recording
+
+STATE_KINDS = ("S", "D", "T", "N")
+
+
+class SessionRecorder:
+    def __init__(self, path, clock=time.perf_counter):
+        self.path = path
+        self.clock = clock
+        self.file = open(path, "a", encoding="utf-8")
+        self.start = clock()
+        # Started by the first entry after a flush, so an idle recording does not wake the event loop
+        self.flush_timer = QTimer()
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(int(FLUSH_INTERVAL * 1000))
+        self.flush_timer.timeout.connect(self.flush)
+        self.windows = None  # hwnd -> (title, ex_style, pid) as last written
+        self.hung = set()
+        self.entries = 0
+        self.write("R", FORMAT_VERSION, round(time.time(), 3))
+
+    def write(self, kind, *fields):
+        now = self.clock()
+        self.file.write(json.dumps([round(now - self.start, 4), kind, *fields],
+                                   ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.entries += 1
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        # Also called by the supervisor before it recovers from an exception
+        self.flush_timer.stop()
+        if not self.file.closed:
+            self.file.flush()
+
+    def snapshot(self, records):
+        windows = {record.hwnd: (record.title, record.ex_style, record.pid) for record in records}
+        if self.windows is None:
+            self.write("S", [[hwnd, *window] for hwnd, window in windows.items()])
+        elif windows != self.windows:
+            previous = self.windows
+            added = [[hwnd, *window] for hwnd, window in windows.items() if hwnd not in previous]
+            removed = [hwnd for hwnd in previous if hwnd not in windows]
+            retitled = [[hwnd, window[0]] for hwnd, window in windows.items()
+                        if hwnd in previous and previous[hwnd][0] != window[0]]
+            self.write("D", added, removed, retitled)
+        self.windows = windows
+
+    def title(self, hwnd, title):
+        window = self.windows.get(hwnd) if self.windows is not None else None
+        if window is not None and window[0] != title:
+            self.windows[hwnd] = (title,) + window[1:]
+            self.write("T", hwnd, title)
+
+    def on_event(self, event, hwnd):
+        self.write("E", event, hwnd)
+
+    def shell_message(self, wparam, lparam):
+        self.write("H", wparam, lparam)
+
+    def icon_fetched(self, hwnd, answered):
+        if not answered and hwnd not in self.hung:
+            self.hung.add(hwnd)
+            self.write("N", hwnd, 1)
+        elif answered and hwnd in self.hung:
+            self.hung.discard(hwnd)
+            self.write("N", hwnd, 0)
+
+    def close(self):
+        self.flush_timer.stop()
+        self.file.close()
+
+    def stats(self):
+        return {"entries": self.entries, "bytes": self.file.tell() if not self.file.closed else None}
+
+
+def read_session(path):
+    # The entries of the first recording in the file
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry[1] == "R":
+                if entries:
+                    break
+                continue
+            entries.append(entry)
+    return entries
+
+
+def advance_state(entries):
+    # Window changes move back to the first event after the previous change; the order is kept
+    result = []
+    first_event = None  # Index in result of the first event since the last window change
+    for entry in entries:
+        if entry[1] in STATE_KINDS:
+            if first_event is not None:
+                result.insert(first_event, [result[first_event][0]] + entry[1:])
+                first_event = None
+                continue
+        elif first_event is None:
+            first_event = len(result)
+        result.append(entry)
+    return result
+
+
+class SessionReplay:
+    """Feeds a recorded session to a model running on a SimulatedDesktop.
+
+    The model should be built with rules=[]: the recorded windows already
+    passed the recording bar's rules. `finished` is called once the last
+    entry has been replayed.
+    """
+
+    def __init__(self, desktop, model, entries, speed=1.0, finished=None, clock=time.perf_counter):
+        self.desktop = desktop
+        self.model = model
+        self.entries = advance_state(entries)
+        self.speed = speed
+        self.finished = finished
+        self.clock = clock
+        self.position = 0
+        self.started = None
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.step)
+        self.lag_max = 0.0  # Seconds the replay fell behind its schedule
+
+    def start(self):
+        self.started = self.clock()
+        self.timer.start(0)
+
+    def stop(self):
+        self.timer.stop()
+
+    def step(self):
+        elapsed = (self.clock() - self.started) * self.speed
+        entries = self.entries
+        while self.position < len(entries):
+            entry = entries[self.position]
+            if self.speed and entry[0] > elapsed:
+                self.timer.start(max(0, int((entry[0] - elapsed) / self.speed * 1000)))
+                return
+            if self.speed:
+                self.lag_max = max(self.lag_max, (elapsed - entry[0]) / self.speed)
+            self.position += 1
+            self.apply(entry)
+            if not self.speed:
+                # Let the model's timers and the icon deliveries run between entries
+                self.timer.start(0)
+                return
+        if self.finished is not None:
+            self.finished()
+
+    def apply(self, entry):
+        kind = entry[1]
+        source = self.desktop.window_source
+        if kind == "E":
+            self.desktop.event_source.emit(entry[2], entry[3])
+        elif kind == "H":
+            self.model.on_shell_message(entry[2], entry[3])
+        elif kind == "S" or kind == "D":
+            for hwnd, title, ex_style, pid in entry[2]:
+                source.add_window(title, ex_style=ex_style, pid=pid, hwnd=hwnd)
+                source.icons[hwnd] = pid % 40 + 1  # One icon per program, as most programs have
+            if kind == "D":
+                for hwnd in entry[3]:
+                    source.remove_window(hwnd)
+                    source.hung.discard(hwnd)
+                for hwnd, title in entry[4]:
+                    source.set_title(hwnd, title)
+        elif kind == "T":
+            if entry[2] in source.windows:
+                source.set_title(entry[2], entry[3])
+        elif kind == "N":
+            self.desktop.hang(entry[2], bool(entry[3]))
+
+    def stats(self):
+        return {"entries": len(self.entries), "replayed": self.position, "lag_max_ms": round(self.lag_max * 1000, 3)}
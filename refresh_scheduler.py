@@ -0,0 +1,113 @@
+"""Coalesces bursts of shell events into few taskbar refreshes.
+
+The scheduler knows nothing about Qt or Win32: it is handed a refresh
+callback, a title-only callback, a `schedule(delay_seconds, callback)`
+function and a clock, so it can be driven by a fake clock in tests.
+"""
+import time
+
+
+class RefreshScheduler:
+    def __init__(self, refresh, retitle, schedule, window=0.05, clock=time.monotonic):
+        self.refresh = refresh    # Full rescan of the desktop
+        self.retitle = retitle    # retitle(hwnds) -> True if a full rescan is needed instead
+        self.schedule = schedule
+        self.window = window      # At most one flush per window (seconds)
+        self.clock = clock
+
+        self.pending_refresh = False
+        self.pending_titles = set()
+        self.armed = False
+        self.last_flush = None
+
+        self.events_received = 0
+        self.refreshes_executed = 0
+        self.retitles_executed = 0
+
+    def window_changed(self, hwnd=None):
+        # A window was created or destroyed: the next flush rescans
+        self.events_received += 1
+        self.pending_refresh = True
+        self.arm()
+
+    def title_changed(self, hwnd):
+        # Only the title of one window changed: the next flush re-reads just that hwnd
+        self.events_received += 1
+        self.pending_titles.add(hwnd)
+        self.arm()
+
+    def arm(self):
+        if self.armed:
+            return
+        self.armed = True
+        # The first event after a quiet period flushes right away, later ones wait out the window
+        delay = 0.0
+        if self.last_flush is not None:
+            delay = max(0.0, self.last_flush + self.window - self.clock())
+        self.schedule(delay, self.flush)
+
+    def flush(self):
+        self.armed = False
+        self.last_flush = self.clock()
+        needs_refresh = self.pending_refresh
+        titles = self.pending_titles
+        self.pending_refresh = False
+        self.pending_titles = set()
+
+        if titles and not needs_refresh:
+            needs_refresh = self.retitle(titles)
+            if not needs_refresh:
+                self.retitles_executed += 1
+        if needs_refresh:
+            self.refresh()
+            self.refreshes_executed += 1
+
+    def stats(self):
+        return {
+            "events_received": self.events_received,
+            "refreshes_executed": self.refreshes_executed,
+            "retitles_executed": self.retitles_executed,
+        }
+
+
+class ReconcileSweep:
+    """Safety-net rescan for event-driven mode.
+
+    `sweep()` rescans and returns True if it found changes the events had
+    missed. While nothing drifts the interval doubles from `minimum` up to
+    `maximum`; any drift drops it back to `minimum`.
+    """
+
+    def __init__(self, sweep, schedule, minimum=1.0, maximum=30.0, factor=2.0, clock=time.monotonic):
+        self.sweep = sweep
+        self.schedule = schedule
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.clock = clock
+
+        self.interval = minimum
+        self.sweeps = 0
+        self.drifts = 0
+        self.last_drift = None
+
+    def start(self):
+        self.schedule(self.interval, self.run)
+
+    def run(self):
+        self.sweeps += 1
+        if self.sweep():
+            self.drifts += 1
+            self.last_drift = self.clock()
+            self.interval = self.minimum
+        else:
+            self.interval = min(self.maximum, self.interval * self.factor)
+        self.schedule(self.interval, self.run)
+
+    def stats(self):
+        return {
+            "sweeps": self.sweeps,
+            "drifts": self.drifts,
+            "interval": self.interval,
+            "seconds_since_drift": None if self.last_drift is None else self.clock() - self.last_drift,
+        }
@@ -0,0 +1,79 @@
+"""Startup milestones and import timing.
+
+StartupTimeline records named milestones in milliseconds since the
+timeline was created, which main.py does before its own imports. The bar
+marks "shell_shown", "first_paint", "windows_listed" and "icons_loaded"
+as it comes up.
+
+ImportTimer is a small `-X importtime` that also works in the frozen
+build, where interpreter options cannot be passed. While installed it
+records the self and cumulative time of every module imported for the
+first time.
+"""
+import builtins
+import sys
+import time
+
+
+class ImportTimer:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.records = []  # (module, self ms, cumulative ms, depth) in completion order
+        self.stack = []    # [start, time spent in nested imports] per import in progress
+        self.original = None
+
+    def install(self):
+        self.original = builtins.__import__
+        builtins.__import__ = self.timed_import
+
+    def uninstall(self):
+        if self.original is not None:
+            builtins.__import__ = self.original
+            self.original = None
+
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self.original(name, globals, locals, fromlist, level)
+        frame = [self.clock(), 0.0]
+        self.stack.append(frame)
+        try:
+            return self.original(name, globals, locals, fromlist, level)
+        finally:
+            self.stack.pop()
+            elapsed = self.clock() - frame[0]
+            if self.stack:
+                self.stack[-1][1] += elapsed
+            self.records.append((name, (elapsed - frame[1]) * 1000, elapsed * 1000, len(self.stack)))
+
+    def slowest(self, limit=15):
+        return sorted(self.records, key=lambda record: record[1], reverse=True)[:limit]
+
+
+class StartupTimeline:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.origin = clock()
+        self.marks = {}  # milestone -> ms since origin, first time only
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = (self.clock() - self.origin) * 1000
+        return self.marks[name]
+
+    def report(self, import_timer=None):
+        report = {"milestones_ms": {name: round(ms, 1) for name, ms in self.marks.items()}}
+        if import_timer is not None:
+            report["imports_ms"] = [
+                {"module": name, "self": round(self_ms, 2), "cumulative": round(cumulative_ms, 2)}
+                for name, self_ms, cumulative_ms, depth in import_timer.slowest()
+            ]
+        return report
+
+    def format(self, import_timer=None):
+        lines = ["Startup:"]
+        lines += [f"    {name:<24} {ms:8.1f} ms" for name, ms in self.marks.items()]
+        if import_timer is not None:
+            lines.append("Slowest imports (self / cumulative):")
+            lines += [f"    {name:<32} {self_ms:8.2f} {cumulative_ms:8.2f} ms"
+                      for name, self_ms, cumulative_ms, depth in import_timer.slowest()]
+        return "\n".join(lines)
@@ -0,0 +1,182 @@
+"""Keeps the bar running in one process.
+
+With --supervise, main.py hands the running bars to a Supervisor:
+
+- Exceptions that escape a Qt slot are logged, and every bar is rebuilt
+  in place from the model, which still holds the windows, icons and
+  order. Too many in a short time and it gives up with exit code 1.
+- The source files are watched. A change to a module of the UI layer
+  (RELOADABLE) reloads those modules and rebuilds the bars with the new
+  classes. The bar windows stay, so AppBars are only set again if the
+  layout changed. A change to any other module exits with
+  RESTART_EXIT_CODE, because its objects hold state a reload would lose.
+
+update.bat restarts the process on any non-zero exit code.
+"""
+import importlib
+import logging
+import os
+import sys
+import time
+
+from PyQt5.QtCore import QFileSystemWatcher, QTimer
+
+RELOADABLE = ("layout", "widgets", "bar")  # Reloaded in this order, dependencies first
+RESTART_EXIT_CODE = 3
+MAX_CRASHES = 5
+CRASH_WINDOW = 60.0  # Seconds
+
+log = logging.getLogger("pytaskbar.supervisor")
+
+
+def source_modules(directory):
+    # Module name -> source file for every module loaded from the bar's own directory
+    sources = {}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and path.endswith(".py") and os.path.dirname(os.path.abspath(path)) == directory:
+            sources[name] = path
+    return sources
+
+
+def modified_time(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class Supervisor:
+    def __init__(self, app, model, listener, clock=time.perf_counter):
+        self.app = app
+        self.model = model
+        self.listener = listener  # The installed ShellHookListener, replaced on reload
+        self.clock = clock
+        self.sources = {}
+        self.mtimes = {}
+        self.watcher = None
+        self.check_timer = None
+        self.crash_times = []
+        self.recovery_started = None
+        self.previous_excepthook = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.recoveries = 0
+        self.restarts_requested = 0
+        self.recover_ms = None
+        self.recover_ms_max = 0.0
+        self.reload_ms = None
+
+    def start(self, watch=True):
+        # PyQt calls a replaced sys.excepthook instead of aborting on an exception in a slot
+        self.previous_excepthook = sys.excepthook
+        sys.excepthook = self.excepthook
+        if watch and not getattr(sys, "frozen", False):
+            self.watch(os.path.dirname(os.path.abspath(__file__)))
+
+    def stop(self):
+        if self.previous_excepthook is not None:
+            sys.excepthook = self.previous_excepthook
+            self.previous_excepthook = None
+        if self.watcher is not None:
+            self.watcher.deleteLater()
+            self.watcher = None
+
+    def watch(self, directory):
+        self.sources = source_modules(directory)
+        self.mtimes = {name: modified_time(path) for name, path in self.sources.items()}
+        self.watcher = QFileSystemWatcher(list(self.sources.values()))
+        # Editors save in several steps; look once the file has settled
+        self.check_timer = QTimer(self.watcher)
+        self.check_timer.setSingleShot(True)
+        self.check_timer.timeout.connect(self.check_sources)
+        self.watcher.fileChanged.connect(lambda path: self.check_timer.start(500))
+
+    def check_sources(self):
+        # Files replaced on save drop out of the watcher; add them back
+        missing = [path for path in self.sources.values() if path not in self.watcher.files()]
+        if missing:
+            self.watcher.addPaths([path for path in missing if os.path.exists(path)])
+        changed = []
+        for name, path in self.sources.items():
+            mtime = modified_time(path)
+            if mtime is not None and mtime != self.mtimes[name]:
+                self.mtimes[name] = mtime
+                changed.append(name)
+        if not changed:
+            return
+        if all(name in RELOADABLE for name in changed):
+            log.info("Reloading the bar after changes to %s", ", ".join(changed))
+            self.reload()
+        else:
+            self.request_restart(changed)
+
+    def reload(self):
+        # Returns True if the bars now run the reloaded code
+        start = self.clock()
+        try:
+            for name in RELOADABLE:
+                importlib.reload(sys.modules[name])
+        except Exception:
+            # A half-edited file; the running bars are untouched and the next save is tried again
+            self.failed_reloads += 1
+            log.exception("Reload failed, keeping the running code")
+            return False
+        bar_class = sys.modules["bar"].FixedWindowApp
+        for bar in list(self.model.bars):
+            bar.teardown()  # Still the old class, so it undoes what the old build() did
+            bar.__class__ = bar_class
+            bar.build()
+        if self.listener is not None:
+            self.app.removeNativeEventFilter(self.listener)
+            self.listener = sys.modules["bar"].ShellHookListener(self.model)
+            self.app.installNativeEventFilter(self.listener)
+        self.reloads += 1
+        self.reload_ms = (self.clock() - start) * 1000
+        log.info("Reloaded in %.1f ms", self.reload_ms)
+        return True
+
+    def request_restart(self, changed):
+        self.restarts_requested += 1
+        log.warning("Restarting after changes to %s", ", ".join(changed))
+        self.model.close()
+        self.app.exit(RESTART_EXIT_CODE)
+
+    def excepthook(self, kind, value, traceback):
+        log.error("Unhandled exception, rebuilding the bar", exc_info=(kind, value, traceback))
+        if self.model.recorder is not None:
+            self.model.recorder.flush()  # What led up to the exception is the part of a recording that matters
+        now = self.clock()
+        self.crash_times = [when for when in self.crash_times if now - when < CRASH_WINDOW] + [now]
+        if len(self.crash_times) > MAX_CRASHES:
+            log.critical("%d exceptions within %d s, giving up", len(self.crash_times), CRASH_WINDOW)
+            self.model.close()
+            self.app.exit(1)
+            return
+        if self.recovery_started is None:
+            # Several exceptions from one event are one recovery
+            self.recovery_started = now
+            QTimer.singleShot(0, self.recover)
+
+    def recover(self):
+        # Cleared first, so an exception during the rebuild schedules another attempt
+        started, self.recovery_started = self.recovery_started, None
+        for bar in list(self.model.bars):
+            bar.rebuild()
+        # The exception may have cut a refresh short; diff against what the model last showed
+        self.model.update_taskbar_buttons()
+        self.recover_ms = (self.clock() - started) * 1000
+        self.recover_ms_max = max(self.recover_ms_max, self.recover_ms)
+        self.recoveries += 1
+        log.info("Recovered in %.1f ms", self.recover_ms)
+
+    def stats(self):
+        return {
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "recoveries": self.recoveries,
+            "restarts_requested": self.restarts_requested,
+            "recover_ms": self.recover_ms,
+            "recover_ms_max": self.recover_ms_max,
+            "reload_ms": self.reload_ms,
+        }
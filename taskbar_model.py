@@ -0,0 +1,427 @@
+"""The window model shared by every bar.
+
+TaskbarModel owns everything that is not a widget: the desktop backend,
+the single enumeration and diff pass per refresh, icons, groups, the
+foreground state and the hotkeys. Bars (FixedWindowApp, one per screen)
+are registered with `add_bar`; after each change the shared row list is
+split by monitor and every bar is handed its part, so adding a monitor
+adds no enumeration work.
+
+A collapsed group is shown on the monitor of its first window. Windows on
+a monitor without a bar are shown on the first bar.
+"""
+import logging
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QIcon
+
+from background import BackgroundRenderer, background_cache_dir
+from desktop import Win32Desktop
+from elide import TextElider
+from event_source import EVENT_OBJECT_DESTROY, EVENT_SYSTEM_MINIMIZEEND, EVENT_SYSTEM_MOVESIZEEND, WindowEventRouter
+from fetch_pool import IconFetchPool
+from foreground import MINIMIZE, RESTORE, ForegroundTracker
+from grouping import GroupIndex
+from hotkeys import SLOT_COUNT, HotkeyDispatcher
+from icon_cache import IconCache
+from instrumentation import Instruments
+from monitors import MonitorMap, partition
+from ordering import load_order, save_order
+from refresh_scheduler import ReconcileSweep, RefreshScheduler
+from startup import StartupTimeline
+from window_rules import load_rules
+from window_store import WindowStore
+
+ICON_CACHE_BYTES = 4 * 1024 * 1024  # Budget for converted icon pixmaps
+
+HSHELL_WINDOWCREATED = 0x0001
+HSHELL_WINDOWDESTROYED = 0x0002
+HSHELL_REDRAW = 0x0006  # Sent when a taskbar entry's title or icon needs redrawing
+HSHELL_WINDOWTITLECHANGE = 0x000C  # Message ID for window title change
+
+log = logging.getLogger("pytaskbar.model")
+
+
+class TaskbarModel(QObject):
+    # Emitted from icon worker threads, delivered on the GUI thread
+    icon_fetched = pyqtSignal(object, object)
+    # Emitted from the background worker with (key, image)
+    background_ready = pyqtSignal(object, object)
+    # Emitted once the first window list and its icons are in
+    started = pyqtSignal()
+
+    def __init__(self, event_driven=True, instruments=None, desktop=None, startup=None, rules=None):
+        super().__init__()
+        # The shell is shown first; windows are listed after its first paint, icons arrive after that
+        self.startup = startup or StartupTimeline()
+        self.populated = False
+        self.startup_icons = None  # Windows of the first listing still waiting for their icon
+        # One entry per window, updated in place; window_snapshot holds them in display order
+        self.windows = WindowStore()
+        self.window_snapshot = ()
+        self.bars = []
+        self.rows_pending = False
+        self.recorder = None  # A SessionRecorder while --record is on
+        # All Win32 access goes through the desktop; benchmarks pass a simulated one
+        self.desktop = desktop or Win32Desktop()
+        # Stage timers cost nothing unless a report sink was asked for on the command line
+        self.instruments = instruments or Instruments()
+        # Every refresh reads from one snapshot taken through this source
+        self.window_source = self.desktop.window_source
+        # Which windows get a button: the built-in test adjusted by rules.json and the default rules
+        self.window_source.set_rules(load_rules() if rules is None else rules)
+        # Converted icons shared by all windows of an executable
+        self.icon_cache = IconCache(ICON_CACHE_BYTES, lambda pixmap: pixmap.width() * pixmap.height() * pixmap.depth() // 8)
+        # WM_GETICON runs on worker threads so a hung window cannot freeze the bar
+        self.icon_fetched.connect(self.on_icon_fetched)
+        self.icon_fetcher = IconFetchPool(self.window_source, self.icon_fetched.emit, workers=2, timeout=0.25)
+        # Elided titles are shared between buttons and survive retitles back and forth
+        self.text_elider = TextElider()
+        # Windows of the same program sit next to each other and can be collapsed into one row
+        # The program order is learned from drag and drop and restored from disk
+        self.window_groups = GroupIndex(load_order())
+        # Win+1..9, Win+0 activate the first ten rows through a table kept in step with the row order
+        self.hotkeys = HotkeyDispatcher(self.toggle_window, clock=self.desktop.tick_count)
+        # Foreground window and minimized flags, kept current by WinEvents so clicks need no queries
+        self.foreground = ForegroundTracker()
+        # The monitor of each window, looked up once and again only when it moves
+        self.monitors = MonitorMap(self.desktop.window_monitor)
+        # The wallpaper strips are rendered off the GUI thread and cached on disk
+        self.background_ready.connect(self.on_background_ready)
+        self.background = BackgroundRenderer(self.background_ready.emit, background_cache_dir())
+
+        # Shell hook events are merged into at most one refresh per 50 ms
+        self.refresh_scheduler = RefreshScheduler(
+            self.update_taskbar_buttons,
+            self.update_window_titles,
+            self.schedule,
+            window=0.05,
+        )
+
+        # WinEvent hooks report windows shown, hidden, destroyed, renamed, focused, minimized and moved
+        self.event_source = self.desktop.event_source
+        self.event_source.subscribe(self.foreground.on_event)
+        self.event_source.subscribe(self.on_window_event)
+        if event_driven:
+            self.event_router = WindowEventRouter(self.refresh_scheduler, lambda hwnd: hwnd in self.windows, self.window_source)
+            self.event_source.subscribe(self.event_router)
+            self.instruments.add_source("events", self.event_router.stats)
+        if not self.event_source.start():
+            log.warning("Failed to install WinEvent hooks, falling back to polling.")
+            self.event_source.stop()
+            event_driven = False
+        self.foreground.set_foreground(self.desktop.foreground_window())
+
+        if event_driven:
+            # Events do the work; a slow sweep backs off from 1 s to 30 s while it finds no drift
+            self.reconcile_sweep = ReconcileSweep(self.reconcile, self.schedule, minimum=1.0, maximum=30.0)
+            self.reconcile_sweep.start()
+        else:
+            # Use QTimer to periodically update taskbar buttons to ensure consistency
+            self.update_timer = QTimer(self)
+            self.update_timer.timeout.connect(self.update_taskbar_buttons)
+            self.update_timer.start(1000)  # Update every 1 second to ensure buttons reflect current state
+
+        # Counters stay with their components and are only read when a report is made
+        self.instruments.add_source("windows", self.window_source.stats)
+        self.instruments.add_source("filter", self.window_source.filter.stats)
+        self.instruments.add_source("store", self.windows.stats)
+        self.instruments.add_source("widgets", self.widget_stats)
+        self.instruments.add_source("monitors", self.monitors.stats)
+        self.instruments.add_source("icon_cache", self.icon_cache.stats)
+        self.instruments.add_source("icon_fetch", self.icon_fetcher.stats)
+        self.instruments.add_source("elide", self.text_elider.stats)
+        self.instruments.add_source("background", self.background.stats)
+        self.instruments.add_source("scheduler", self.refresh_scheduler.stats)
+        self.instruments.add_source("hotkeys", self.hotkeys.stats)
+        if event_driven:
+            self.instruments.add_source("reconcile", self.reconcile_sweep.stats)
+
+    def add_bar(self, bar):
+        # Also called again by a rebuilt bar, which keeps its place
+        if bar not in self.bars:
+            self.bars.append(bar)
+        self.foreground.subscribe(bar.taskbar_list.set_active)
+        bar.taskbar_list.set_active(self.foreground.foreground)
+        self.show_rows()
+
+    def detach_bar(self, bar):
+        # The bar's widgets are about to be replaced
+        self.foreground.listeners.remove(bar.taskbar_list.set_active)
+
+    def remove_bar(self, bar):
+        self.detach_bar(bar)
+        self.bars.remove(bar)
+        if self.bars and getattr(self, "hwnd", None) == int(bar.winId()):
+            # The shell hook and hotkeys went to the departing bar's window; move them to another
+            self.desktop.unregister_hotkeys(self.hwnd, SLOT_COUNT)
+            self.setup_shell_hook(int(self.bars[0].winId()))
+        self.show_rows()
+
+    def widget_stats(self):
+        stats = {}
+        for bar in self.bars:
+            for key, value in bar.taskbar_list.stats().items():
+                stats[key] = stats.get(key, 0) + value
+        stats["bars"] = len(self.bars)
+        return stats
+
+    def bar_painted(self):
+        # The first paint of any bar starts the first listing
+        if not self.populated and "first_paint" not in self.startup.marks:
+            self.startup.mark("first_paint")
+            QTimer.singleShot(0, self.populate)
+
+    def populate(self):
+        if self.populated:
+            return
+        self.populated = True
+        self.add_taskbar_buttons()
+        self.startup.mark("windows_listed")
+        self.startup_icons = set(self.windows.entries)
+        self.note_startup_icon(None)
+
+    def note_startup_icon(self, hwnd):
+        # Every window of the first listing got an answer, an icon or a timeout
+        if self.startup_icons is None:
+            return
+        self.startup_icons.discard(hwnd)
+        if not self.startup_icons:
+            self.startup_icons = None
+            self.startup.mark("icons_loaded")
+            self.started.emit()
+
+    def get_window_icon(self, record, icon_handle):
+        # The handles belong to the window or its class, so they are converted but never destroyed here.
+        # Windows of one executable usually share a handle, and then share the converted pixmap too.
+        with self.instruments.stage("icon"):
+            key = (self.window_source.process_image_path(record.pid), icon_handle)
+            self.icon_cache.bind(record.hwnd, key)
+            return self.icon_cache.get_or_create(key, lambda: self.desktop.icon_pixmap(icon_handle))
+
+    def on_icon_fetched(self, hwnd, icon_handle):
+        self.note_startup_icon(hwnd)
+        if self.recorder is not None:
+            self.recorder.icon_fetched(hwnd, icon_handle is not None)
+        record = self.windows.get(hwnd)
+        if record is None:
+            return  # The window went away while its icon was being fetched
+        if icon_handle is None:
+            if self.icon_fetcher.is_not_responding(hwnd):
+                for bar in self.bars:
+                    bar.taskbar_list.set_tooltip(hwnd, f"{record.title} (Not Responding)")
+            return
+        icon = QIcon(self.get_window_icon(record, icon_handle)) if icon_handle else None
+        for bar in self.bars:
+            bar.taskbar_list.set_tooltip(hwnd, None)
+            if icon is not None:
+                bar.taskbar_list.set_icon(hwnd, icon)
+
+    def on_background_ready(self, key, image):
+        self.background.finished(key, image)
+        for bar in self.bars:
+            bar.on_background_ready(key, image)
+
+    def schedule_background_update(self):
+        for bar in self.bars:
+            bar.schedule_background_update()
+
+    def schedule_layout(self):
+        for bar in self.bars:
+            bar.schedule_layout()
+
+    def on_window_event(self, event, hwnd):
+        if event == EVENT_SYSTEM_MOVESIZEEND or event == EVENT_SYSTEM_MINIMIZEEND:
+            # The end of a drag or a restore; moves made by programs are caught by the reconcile sweep
+            if self.monitors.window_moved(hwnd):
+                self.schedule_rows()
+        elif event == EVENT_OBJECT_DESTROY:
+            self.monitors.forget(hwnd)
+
+    def displays_changed(self):
+        self.desktop.displays_changed()
+        self.monitors.clear()
+        self.schedule_rows()
+        self.schedule_layout()
+
+    def add_taskbar_buttons(self):
+        # The first refresh starts from an empty store, so every window is "added"
+        self.window_snapshot = ()
+        self.windows.clear()
+        self.update_taskbar_buttons()
+
+    def get_taskbar_windows(self):
+        # One EnumWindows pass; returns a tuple of WindowRecord
+        with self.instruments.stage("snapshot"):
+            records = self.window_source.snapshot()
+        if self.recorder is not None:
+            self.recorder.snapshot(records)
+        return records
+
+    def update_taskbar_buttons(self):
+        if not self.populated:
+            return None  # The first listing waits for the first paint
+        with self.instruments.stage("refresh"):
+            return self.refresh_taskbar_buttons()
+
+    def refresh_taskbar_buttons(self):
+        records = self.get_taskbar_windows()
+        # The group index only resolves the program of windows it has not seen yet
+        self.window_groups.sync(records, lambda record: self.window_source.process_image_path(record.pid))
+        # The store compares title hashes and positions and only the widgets that changed are touched
+        self.window_snapshot, patch = self.windows.apply(records, self.window_groups.ordered)
+        if patch:
+            self.apply_taskbar_patch(patch)
+        self.icon_fetcher.retry_due()
+        return patch
+
+    def reconcile(self):
+        # Changes the scheduler is already about to apply are not drift
+        pending = self.refresh_scheduler.armed
+        patch = self.update_taskbar_buttons()
+        moved = self.monitors.relocate()
+        if moved:
+            self.schedule_rows()
+        return (bool(patch) and not pending) or moved
+
+    def schedule(self, delay, callback):
+        QTimer.singleShot(int(delay * 1000), callback)
+
+    def update_window_titles(self, hwnds):
+        # Title-only events re-read just the affected windows instead of rescanning
+        if any(hwnd not in self.windows for hwnd in hwnds):
+            return True  # Not on the bar yet, it may have just gained a title
+
+        for hwnd in hwnds:
+            title = self.window_source.get_title(hwnd)
+            if self.recorder is not None:
+                self.recorder.title(hwnd, title)
+            if self.window_source.filter.title_changed(hwnd, title):
+                return True  # The window may have to leave the bar
+            self.windows.retitle(hwnd, title)
+            if self.icon_cache.bound_key(hwnd) is None:
+                # HSHELL_REDRAW dropped the binding, the window may have a new icon
+                self.icon_fetcher.request(hwnd)
+        self.show_titles()
+        return False
+
+    def apply_taskbar_patch(self, patch):
+        for hwnd in patch.removed:
+            for bar in self.bars:
+                bar.taskbar_list.forget(hwnd)
+            self.icon_cache.invalidate_window(hwnd)
+            self.icon_fetcher.forget(hwnd)
+            self.monitors.forget(hwnd)
+
+        # New windows show a placeholder until the icon worker answers
+        for index, record in patch.added:
+            self.icon_fetcher.request(record.hwnd)
+            # Windows that start minimized never send a minimize event
+            self.foreground.seed_window(record.hwnd, self.desktop.is_minimized(record.hwnd))
+
+        if patch.added or patch.removed or patch.moved:
+            # The rows, the bar each lands on and the hotkey slots follow the new order
+            self.show_rows()
+        elif patch.retitled:
+            self.show_titles()
+
+    def show_titles(self):
+        # Rows are the store's entries, so a retitle only rebinds the visible buttons showing them
+        for bar in self.bars:
+            bar.taskbar_list.bind_slots()
+
+    def schedule_rows(self):
+        # Monitor changes come in bursts while windows are dragged; lay out once
+        if not self.rows_pending:
+            self.rows_pending = True
+            self.schedule(0, self.show_rows)
+
+    def show_rows(self):
+        self.rows_pending = False
+        rows = self.window_groups.rows(self.window_snapshot)
+        if self.bars:
+            parts = partition(rows, self.monitors.get, [bar.monitor for bar in self.bars])
+            for bar in self.bars:
+                bar.taskbar_list.set_rows(parts[bar.monitor])
+        self.hotkeys.table.update([row.hwnd for row in rows[:SLOT_COUNT]])
+
+    def move_row(self, source, target):
+        # A collapsed group row stands for its first window, so dropping it moves the whole program
+        if self.window_groups.move_window(source.hwnd, target.hwnd):
+            self.save_order()
+        # The new order becomes the displayed snapshot, the next refresh compares against it
+        self.window_snapshot = self.window_groups.ordered(self.windows.entries)
+        self.windows.place(self.window_snapshot)
+        self.show_rows()
+
+    def save_order(self):
+        try:
+            save_order(self.window_groups.order)
+        except OSError as e:
+            log.error("Failed to save taskbar order: %s", e)
+
+    def set_group_collapsed(self, key, collapsed):
+        self.window_groups.set_collapsed(key, collapsed)
+        self.show_rows()
+
+    def toggle_window(self, hwnd):
+        # Toggle the specified window between minimized and foreground, decided from the tracked state
+        action = self.foreground.toggle_action(hwnd)
+        try:
+            if action == MINIMIZE:
+                # The window is in the foreground, minimize it
+                self.desktop.minimize(hwnd)
+            else:
+                # If the window is not in the foreground, bring it to the front
+                if action == RESTORE:
+                    self.desktop.restore(hwnd)
+                self.desktop.activate(hwnd)
+            self.foreground.note_action(hwnd, action)
+        except Exception as e:
+            log.warning("Failed to toggle window %s: %s", hwnd, e)
+
+    def setup_shell_hook(self, hwnd):
+        # Shell hook messages and hotkeys are delivered to one bar's window
+        self.hwnd = hwnd
+        self.WM_SHELLHOOKMESSAGE = self.desktop.register_shell_hook(hwnd)
+        if self.WM_SHELLHOOKMESSAGE is None:
+            log.error("Failed to register shell hook window.")
+
+        # Register Win+1..9, Win+0
+        for slot in self.desktop.register_hotkeys(hwnd, SLOT_COUNT):
+            log.warning("Failed to register hotkey Win+%d.", (slot + 1) % 10)
+        log.debug("Shell hook registered with message ID: %s", self.WM_SHELLHOOKMESSAGE)
+
+    def on_shell_message(self, wparam, lparam):
+        # Events are queued on the scheduler, which coalesces bursts into one refresh
+        if self.recorder is not None:
+            self.recorder.shell_message(wparam, lparam)
+        if wparam in (HSHELL_WINDOWCREATED, HSHELL_WINDOWDESTROYED):
+            self.refresh_scheduler.window_changed(lparam)
+        elif wparam in (HSHELL_REDRAW, HSHELL_WINDOWTITLECHANGE):
+            if wparam == HSHELL_REDRAW:
+                # The window may have set a new icon; re-resolve it with the title
+                self.icon_cache.invalidate_window(lparam)
+            self.refresh_scheduler.title_changed(lparam)
+
+    def start_recording(self, recorder):
+        # Everything from here on, starting with the windows already listed, goes to the recorder
+        self.recorder = recorder
+        self.event_source.subscribe(recorder.on_event)
+        self.instruments.add_source("recording", recorder.stats)
+        if self.populated:
+            recorder.snapshot(self.window_source.snapshot())
+
+    def close(self):
+        self.event_source.stop()
+        self.icon_fetcher.shutdown()
+        self.background.shutdown()
+        self.save_order()
+        self.instruments.report()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if hasattr(self, "hwnd"):
+            self.desktop.unregister_hotkeys(self.hwnd, SLOT_COUNT)
+        for bar in self.bars:
+            bar.unregister_app_bar()
@@ -1,3 +1,5 @@
 :hello
-python main.py
-goto hello
+rem The supervisor handles exceptions and edits to the bar in-process.
+rem It exits with 3 to restart after other code changes, and 0 on close.
+python main.py --supervise
+if errorlevel 1 goto hello
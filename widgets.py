@@ -0,0 +1,339 @@
+"""Taskbar widgets that only depend on Qt, so they run under the offscreen platform."""
+from PyQt5.QtCore import QMimeData, QPropertyAnimation, QRect, Qt, pyqtProperty, pyqtSignal
+from PyQt5.QtGui import QColor, QDrag, QPainter, QPixmap
+from PyQt5.QtWidgets import QApplication, QPushButton, QScrollBar, QSizePolicy, QToolTip, QWidget
+
+from grouping import GroupRow
+
+
+class DraggableButton(QPushButton):
+    def __init__(self, title, parent):
+        super().__init__(title, parent)
+        self.setAcceptDrops(True)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_start_position = event.pos()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if not (event.buttons() & Qt.LeftButton):
+            return
+        if (event.pos() - self.drag_start_position).manhattanLength() < QApplication.startDragDistance():
+            return
+
+        drag = QDrag(self)
+        mime_data = QMimeData()
+        mime_data.setText(self.text())  # Store button text to help identify during drop
+        drag.setMimeData(mime_data)
+        drag.setHotSpot(event.pos() - self.rect().topLeft())
+
+        drop_action = drag.exec_(Qt.MoveAction)
+        self.setDown(False)  # The drag swallowed the release, don't leave the button pressed
+
+    def dragEnterEvent(self, event):
+        event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        # Notify the parent to handle the button swap; buttons only trade places with siblings
+        source = event.source()
+        if source is not self and isinstance(source, DraggableButton) and source.parent() is self.parent():
+            self.parent().swap_buttons(self, source)
+        event.acceptProposedAction()
+
+
+class BackgroundStrip(QWidget):
+    """Paints the rendered wallpaper strip, or a plain translucent fill until there is one."""
+
+    def __init__(self, fill_color, parent):
+        super().__init__(parent)
+        self.fill_color = fill_color
+        self.pixmap = None
+
+    def set_image(self, image):
+        self.pixmap = QPixmap.fromImage(image) if image is not None else None
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self.pixmap is None:
+            painter.fillRect(self.rect(), self.fill_color)
+        else:
+            painter.drawPixmap(self.rect(), self.pixmap)
+        painter.end()
+
+
+class TaskbarButton(DraggableButton):
+    """A window's button on the bar.
+
+    The hover effect animates the `backgroundColor` property and paints it
+    in paintEvent. The style sheet is set once, so a hover never re-parses
+    CSS or re-polishes the widget; each button reuses one animation.
+    """
+
+    NORMAL_COLOR = QColor(0, 0, 128, 128)
+    ACTIVE_COLOR = QColor(48, 48, 192, 200)
+    HOVER_COLOR = QColor("red")
+    STYLE = ("QPushButton { background-color: transparent; border: none; color: white; padding-left: 5px; text-align: left; white-space: nowrap; } "
+             "QToolTip { background-color: white; color: black; border: 1px solid black; }")
+
+    def __init__(self, title, parent=None):
+        super().__init__(title, parent)
+        self._background_color = QColor(self.NORMAL_COLOR)
+        self.badge = 0  # Window count drawn on collapsed group rows
+        self.active = False  # Shows the foreground window
+        self.setStyleSheet(self.STYLE)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+        self.hover_animation = QPropertyAnimation(self, b"backgroundColor", self)
+        self.hover_animation.setDuration(300)
+
+    def set_title(self, title, elider, tooltip=None):
+        # Adjust text to show ellipsis if too long, considering icon size
+        font_metrics = self.fontMetrics()
+        icon_width = self.iconSize().width() if not self.icon().isNull() else 0
+        padding = 15  # Include some padding for better visual spacing
+        available_width = self.width() - icon_width - padding
+        self.setText(elider.elide(font_metrics, self.font().key(), title, available_width))
+        self.setToolTip(title if tooltip is None else tooltip)
+
+    def getBackgroundColor(self):
+        return self._background_color
+
+    def setBackgroundColor(self, color):
+        self._background_color = color
+        self.update()
+
+    backgroundColor = pyqtProperty(QColor, getBackgroundColor, setBackgroundColor)
+
+    def animate_background(self, color):
+        # Start from the current color so leaving mid-animation reverses smoothly
+        self.hover_animation.stop()
+        self.hover_animation.setStartValue(self._background_color)
+        self.hover_animation.setEndValue(color)
+        self.hover_animation.start()
+
+    def rest_color(self):
+        return self.ACTIVE_COLOR if self.active else self.NORMAL_COLOR
+
+    def set_active(self, active):
+        if active != self.active:
+            self.active = active
+            if not self.underMouse():
+                self.animate_background(self.rest_color())
+
+    def enterEvent(self, event):
+        self.animate_background(self.HOVER_COLOR)
+        QToolTip.showText(self.mapToGlobal(self.rect().center()), self.toolTip(), self)
+        super().enterEvent(event)
+
+    def leaveEvent(self, event):
+        self.animate_background(self.rest_color())
+        super().leaveEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self._background_color)
+        painter.end()
+        super().paintEvent(event)
+        if self.badge:
+            painter = QPainter(self)
+            painter.setRenderHint(QPainter.Antialiasing)
+            rect = QRect(self.width() - 18, (self.height() - 14) // 2, 14, 14)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(255, 255, 255, 220))
+            painter.drawEllipse(rect)
+            painter.setPen(QColor("black"))
+            painter.drawText(rect, Qt.AlignCenter, str(self.badge) if self.badge < 100 else "99")
+            painter.end()
+
+    def set_badge(self, count):
+        if count != self.badge:
+            self.badge = count
+            self.update()
+
+
+class TaskbarList(QWidget):
+    """Virtualized list of window buttons.
+
+    Only as many TaskbarButtons exist as rows fit in the widget; scrolling
+    rebinds them to other records instead of creating widgets. A slot is
+    only touched when the record it shows changes, so an unchanged snapshot
+    costs no widget work however many windows are open.
+
+    Rows are window records or GroupRows standing in for a collapsed group.
+    """
+
+    activated = pyqtSignal(object)          # hwnd of the clicked window row
+    group_activated = pyqtSignal(object)    # key of the clicked group row
+    context_requested = pyqtSignal(object, object)  # row, global position
+    row_moved = pyqtSignal(object, object)  # dragged row, row it was dropped on
+
+    SCROLLBAR_WIDTH = 6
+
+    def __init__(self, parent, row_height, elider, placeholder_icon):
+        super().__init__(parent)
+        self.row_height = row_height
+        self.elider = elider
+        self.placeholder_icon = placeholder_icon
+        self.rows = ()
+        self.icons = {}     # hwnd -> QIcon
+        self.tooltips = {}  # hwnd -> tooltip overriding the title
+        self.active = None  # hwnd of the foreground window
+        self.offset = 0
+        self.wheel_delta = 0
+        self.slots = []
+        self.slot_of = {}   # button -> slot index, for drops
+        self.bound = []     # What each slot shows: (hwnd, title, icon, tooltip, count, active) or None
+
+        self.scrollbar = QScrollBar(Qt.Vertical, self)
+        self.scrollbar.setStyleSheet("QScrollBar { background: transparent; width: %dpx; } "
+                                     "QScrollBar::handle { background: rgba(255, 255, 255, 0.4); } "
+                                     "QScrollBar::add-line, QScrollBar::sub-line { height: 0px; }" % self.SCROLLBAR_WIDTH)
+        self.scrollbar.valueChanged.connect(self.scroll_to)
+        self.scrollbar.hide()
+
+        self.widgets_created = 0
+        self.widgets_destroyed = 0
+        self.rebinds = 0  # Slots whose content changed
+
+    def resizeEvent(self, event):
+        self.resize_pool()
+        super().resizeEvent(event)
+
+    def resize_pool(self):
+        # The only place buttons are created or destroyed
+        rows = max(0, self.height() // self.row_height)
+        while len(self.slots) < rows:
+            button = TaskbarButton("", self)
+            button.setGeometry(0, len(self.slots) * self.row_height, self.width(), self.row_height)
+            button.clicked.connect(lambda checked, slot=len(self.slots): self.slot_clicked(slot))
+            button.setContextMenuPolicy(Qt.CustomContextMenu)
+            button.customContextMenuRequested.connect(lambda pos, slot=len(self.slots): self.slot_context_menu(slot, pos))
+            button.hide()
+            self.slot_of[button] = len(self.slots)
+            self.slots.append(button)
+            self.bound.append(None)
+            self.widgets_created += 1
+        while len(self.slots) > rows:
+            button = self.slots.pop()
+            del self.slot_of[button]
+            button.deleteLater()
+            self.bound.pop()
+            self.widgets_destroyed += 1
+        for index, button in enumerate(self.slots):
+            if button.width() != self.width():
+                button.setGeometry(0, index * self.row_height, self.width(), self.row_height)
+                self.bound[index] = None
+        self.scrollbar.setGeometry(self.width() - self.SCROLLBAR_WIDTH, 0, self.SCROLLBAR_WIDTH, self.height())
+        self.update_scrollbar()
+        self.bind_slots()
+
+    def slot_row(self, slot):
+        position = self.offset + slot
+        return self.rows[position] if self.bound[slot] is not None and position < len(self.rows) else None
+
+    def slot_clicked(self, slot):
+        row = self.slot_row(slot)
+        if isinstance(row, GroupRow):
+            self.group_activated.emit(row.key)
+        elif row is not None:
+            self.activated.emit(row.hwnd)
+
+    def slot_context_menu(self, slot, pos):
+        row = self.slot_row(slot)
+        if row is not None:
+            self.context_requested.emit(row, self.slots[slot].mapToGlobal(pos))
+
+    def swap_buttons(self, target_button, source_button):
+        # Called by a dropped-on button; the order lives in the model, so report the rows instead of moving widgets
+        source = self.slot_row(self.slot_of[source_button])
+        target = self.slot_row(self.slot_of[target_button])
+        if source is not None and target is not None:
+            self.row_moved.emit(source, target)
+
+    def set_rows(self, rows):
+        self.rows = rows
+        self.update_scrollbar()
+        self.bind_slots()
+
+    def set_icon(self, hwnd, icon):
+        self.icons[hwnd] = icon
+        self.bind_slots()
+
+    def set_tooltip(self, hwnd, tooltip):
+        if tooltip is None:
+            self.tooltips.pop(hwnd, None)
+        else:
+            self.tooltips[hwnd] = tooltip
+        self.bind_slots()
+
+    def set_active(self, hwnd):
+        if hwnd != self.active:
+            self.active = hwnd
+            self.bind_slots()
+
+    def forget(self, hwnd):
+        self.icons.pop(hwnd, None)
+        self.tooltips.pop(hwnd, None)
+
+    def stats(self):
+        return {
+            "rows": len(self.rows),
+            "widgets_created": self.widgets_created,
+            "widgets_destroyed": self.widgets_destroyed,
+            "rebinds": self.rebinds,
+        }
+
+    def max_offset(self):
+        return max(0, len(self.rows) - len(self.slots))
+
+    def update_scrollbar(self):
+        maximum = self.max_offset()
+        self.offset = min(self.offset, maximum)
+        self.scrollbar.blockSignals(True)
+        self.scrollbar.setRange(0, maximum)
+        self.scrollbar.setPageStep(max(1, len(self.slots)))
+        self.scrollbar.setValue(self.offset)
+        self.scrollbar.blockSignals(False)
+        self.scrollbar.setVisible(maximum > 0)
+        self.scrollbar.raise_()
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, self.max_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.scrollbar.setValue(offset)
+            self.bind_slots()
+
+    def wheelEvent(self, event):
+        # One notch (120) scrolls three rows, like most Windows lists; touchpads send smaller steps
+        self.wheel_delta += event.angleDelta().y()
+        rows = int(self.wheel_delta / 40)
+        self.wheel_delta -= rows * 40
+        self.scroll_to(self.offset - rows)
+        event.accept()
+
+    def bind_slots(self):
+        for index, button in enumerate(self.slots):
+            position = self.offset + index
+            if position < len(self.rows):
+                row = self.rows[position]
+                hwnd = row.hwnd
+                count = row.count if isinstance(row, GroupRow) else 0
+                wanted = (hwnd, row.title, self.icons.get(hwnd), self.tooltips.get(hwnd), count, hwnd == self.active)
+            else:
+                wanted = None
+            if wanted == self.bound[index]:
+                continue
+            self.bound[index] = wanted
+            self.rebinds += 1
+            if wanted is None:
+                button.hide()
+                continue
+            hwnd, title, icon, tooltip, count, active = wanted
+            button.setIcon(icon if icon is not None else self.placeholder_icon)
+            button.set_title(title, self.elider, tooltip)
+            button.set_badge(count)
+            button.set_active(active)
+            button.show()
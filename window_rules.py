@@ -0,0 +1,260 @@
+"""Which windows belong on the bar.
+
+The built-in test (is_taskbar_window) keeps visible, titled windows that
+are neither tool windows nor UWP frame hosts. Rules adjust it: each rule
+matches on any of
+
+    class      window class name, exact, case-insensitive
+    exe        executable file name, e.g. "obs64.exe", case-insensitive
+    title      regular expression searched in the title
+    style      style bits that must all be set      (int or list of names)
+    ex_style   extended style bits that must all be set
+    not_style, not_ex_style   bits that must all be clear
+
+and either excludes the window or includes it despite the built-in test.
+A window still needs to be visible and titled to get a button. The first
+matching rule wins; user rules from %APPDATA%\\PyTaskBar\\rules.json come
+before DEFAULT_RULES.
+
+Rules are compiled once. Each becomes a closure that runs its cheap
+checks (style bits, cached class and exe) before its regex, and only asks
+Windows for what some rule actually uses. WindowFilter caches the verdict
+per hwnd together with the extended style and title it was made for, and
+the window style too while a rule reads it, so a window is only evaluated
+again when one of them changes.
+"""
+import json
+import logging
+import ntpath
+import os
+import re
+
+log = logging.getLogger("pytaskbar.rules")
+
+WS_EX_TOOLWINDOW = 0x00000080
+WS_EX_NOREDIRECTIONBITMAP = 0x00200000  # UWP frame hosts that never show up on the real taskbar
+
+STYLE_BITS = {
+    "WS_VISIBLE": 0x10000000,
+    "WS_CHILD": 0x40000000,
+    "WS_POPUP": 0x80000000,
+    "WS_CAPTION": 0x00C00000,
+    "WS_MINIMIZEBOX": 0x00020000,
+    "WS_EX_TOPMOST": 0x00000008,
+    "WS_EX_TRANSPARENT": 0x00000020,
+    "WS_EX_TOOLWINDOW": WS_EX_TOOLWINDOW,
+    "WS_EX_APPWINDOW": 0x00040000,
+    "WS_EX_LAYERED": 0x00080000,
+    "WS_EX_NOACTIVATE": 0x08000000,
+    "WS_EX_NOREDIRECTIONBITMAP": WS_EX_NOREDIRECTIONBITMAP,
+}
+
+DEFAULT_RULES = [
+    # The desktop itself and shell surfaces that are visible and titled but never on the real taskbar
+    {"action": "exclude", "class": "Progman"},
+    {"action": "exclude", "class": "Windows.UI.Core.CoreWindow"},
+    # IME and text input helpers
+    {"action": "exclude", "class": "IME"},
+    {"action": "exclude", "class": "MSCTFIME UI"},
+    {"action": "exclude", "title": "^Microsoft Text Input Application$"},
+]
+
+RULE_FIELDS = {"action", "class", "exe", "title", "style", "ex_style", "not_style", "not_ex_style"}
+
+
+def is_taskbar_window(ex_style, visible, title):
+    # Filter only normal, visible windows with titles
+    return bool(not (ex_style & WS_EX_TOOLWINDOW) and visible and title and ex_style != WS_EX_NOREDIRECTIONBITMAP)
+
+
+def rules_file_path():
+    base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    return os.path.join(base, "PyTaskBar", "rules.json")
+
+
+def load_rules(path=None):
+    # User rules first, then the defaults; a broken file is reported and skipped
+    path = path or rules_file_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            user_rules = json.load(f)
+        compile_rules(user_rules)
+    except FileNotFoundError:
+        user_rules = []
+    except (OSError, ValueError, TypeError) as e:
+        log.error("Ignoring window rules in %s: %s", path, e)
+        user_rules = []
+    return user_rules + DEFAULT_RULES
+
+
+def style_mask(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        raise ValueError(f"style bits must be an int, a name or a list of names: {value!r}")
+    mask = 0
+    for name in value:
+        if not isinstance(name, str) or name not in STYLE_BITS:
+            raise ValueError(f"unknown style bit {name!r}")
+        mask |= STYLE_BITS[name]
+    return mask
+
+
+def compile_rule(rule):
+    # Returns (include, match); match(hwnd, ex_style, title, facts) -> bool. Raises ValueError for a bad rule
+    if not isinstance(rule, dict):
+        raise ValueError(f"a rule must be an object: {rule!r}")
+    unknown = set(rule) - RULE_FIELDS
+    if unknown:
+        raise ValueError(f"unknown rule fields {sorted(unknown)}")
+    if rule.get("action") not in ("include", "exclude"):
+        raise ValueError(f"rule action must be 'include' or 'exclude': {rule!r}")
+    for field in ("class", "exe", "title"):
+        if field in rule and not isinstance(rule[field], str):
+            raise ValueError(f"rule field {field!r} must be a string: {rule!r}")
+
+    checks = []
+    # Cheapest first: bits already read by the enumeration, then per-hwnd and per-pid caches, regex last
+    if "ex_style" in rule:
+        mask = style_mask(rule["ex_style"])
+        checks.append(lambda hwnd, ex_style, title, facts: ex_style & mask == mask)
+    if "not_ex_style" in rule:
+        clear = style_mask(rule["not_ex_style"])
+        checks.append(lambda hwnd, ex_style, title, facts: not ex_style & clear)
+    if "class" in rule:
+        class_name = rule["class"].casefold()
+        checks.append(lambda hwnd, ex_style, title, facts: facts.class_name(hwnd) == class_name)
+    if "exe" in rule:
+        exe = rule["exe"].casefold()
+        checks.append(lambda hwnd, ex_style, title, facts: facts.exe(hwnd) == exe)
+    if "style" in rule:
+        style_bits = style_mask(rule["style"])
+        checks.append(lambda hwnd, ex_style, title, facts: facts.style(hwnd) & style_bits == style_bits)
+    if "not_style" in rule:
+        clear_style = style_mask(rule["not_style"])
+        checks.append(lambda hwnd, ex_style, title, facts: not facts.style(hwnd) & clear_style)
+    if "title" in rule:
+        try:
+            search = re.compile(rule["title"]).search
+        except re.error as e:
+            raise ValueError(f"bad title pattern {rule['title']!r}: {e}") from None
+        checks.append(lambda hwnd, ex_style, title, facts: search(title) is not None)
+    if not checks:
+        raise ValueError(f"rule matches nothing: {rule!r}")
+
+    if len(checks) == 1:
+        match = checks[0]
+    else:
+        def match(hwnd, ex_style, title, facts):
+            for check in checks:
+                if not check(hwnd, ex_style, title, facts):
+                    return False
+            return True
+    return rule["action"] == "include", match
+
+
+def compile_rules(rules):
+    if not isinstance(rules, (list, tuple)):
+        raise ValueError(f"rules must be a list, got {type(rules).__name__}")
+    return [compile_rule(rule) for rule in rules]
+
+
+class WindowFilter:
+    """Decides per window, with the verdict cached per hwnd.
+
+    `source` is the WindowSource; it supplies class names, styles, pids
+    and executable paths, which are only asked for when a rule needs them.
+    """
+
+    def __init__(self, source, rules=()):
+        self.source = source
+        self.rules = compile_rules(rules)
+        self.uses_title = any("title" in rule for rule in rules)
+        self.uses_style = any("style" in rule or "not_style" in rule for rule in rules)
+        self.verdicts = {}     # hwnd -> (ex_style, title, keep, style); style is 0 unless a rule reads it
+        self.class_names = {}  # hwnd -> casefolded class name, fixed for the life of a window
+        self.exes = {}         # hwnd -> casefolded executable name, likewise
+        self.hits = 0
+        self.evaluations = 0
+
+    def keep(self, hwnd, ex_style, title):
+        # Called for visible windows only; a popup that gains a caption has to be judged again
+        style = self.source.get_style(hwnd) if self.uses_style else 0
+        cached = self.verdicts.get(hwnd)
+        if cached is not None and cached[0] == ex_style and cached[1] == title and cached[3] == style:
+            self.hits += 1
+            return cached[2]
+        self.evaluations += 1
+        keep = self.evaluate(hwnd, ex_style, title)
+        self.verdicts[hwnd] = (ex_style, title, keep, style)
+        return keep
+
+    def evaluate(self, hwnd, ex_style, title):
+        if not title:
+            return False
+        for include, match in self.rules:
+            if match(hwnd, ex_style, title, self):
+                return include
+        return is_taskbar_window(ex_style, True, title)
+
+    def title_changed(self, hwnd, title):
+        # True if the new title may change whether the window is shown
+        if not self.uses_title:
+            return not title
+        cached = self.verdicts.get(hwnd)
+        return cached is None or self.evaluate(hwnd, cached[0], title) != cached[2]
+
+    def known_excluded(self, hwnd):
+        # True if the window was left off the bar and showing or focusing it again changes nothing
+        cached = self.verdicts.get(hwnd)
+        return cached is not None and not cached[2]
+
+    def title_may_matter(self, hwnd):
+        # For a window without a button: could its new title put it on the bar? Windows without a
+        # verdict were hidden or created since the last enumeration; their EVENT_OBJECT_SHOW decides
+        cached = self.verdicts.get(hwnd)
+        if cached is None:
+            return False
+        if cached[2]:
+            return True
+        if cached[1] and not self.uses_title:
+            return False  # Left off for its styles, class or program, which a title does not change
+        return self.evaluate(hwnd, cached[0], self.source.get_title(hwnd))
+
+    def forget(self, hwnd):
+        # A hidden window may come back with other styles, and a destroyed one's hwnd may be reused
+        # by another class or program; it is evaluated and looked up again when shown
+        self.verdicts.pop(hwnd, None)
+        self.class_names.pop(hwnd, None)
+        self.exes.pop(hwnd, None)
+
+    def class_name(self, hwnd):
+        name = self.class_names.get(hwnd)
+        if name is None:
+            name = self.class_names[hwnd] = self.source.get_class_name(hwnd).casefold()
+        return name
+
+    def exe(self, hwnd):
+        exe = self.exes.get(hwnd)
+        if exe is None:
+            exe = self.exes[hwnd] = ntpath.basename(self.source.process_image_path(self.source.window_pid(hwnd))).casefold()
+        return exe
+
+    def style(self, hwnd):
+        return self.source.get_style(hwnd)
+
+    def prune(self, live):
+        # `live` holds every visible window of the last enumeration; each cache is pruned on its own,
+        # since class names and exes are also filled for windows that never got a verdict
+        live_set = None
+        for cache in (self.verdicts, self.class_names, self.exes):
+            if len(cache) > len(live):
+                if live_set is None:
+                    live_set = set(live)
+                for hwnd in [hwnd for hwnd in cache if hwnd not in live_set]:
+                    del cache[hwnd]
+
+    def stats(self):
+        return {"rules": len(self.rules), "cached_verdicts": len(self.verdicts), "cached_classes": len(self.class_names), "hits": self.hits, "evaluations": self.evaluations}
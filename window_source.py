@@ -0,0 +1,282 @@
+from collections import Counter, namedtuple
+import logging
+import time
+
+from enumeration import BatchedEnumerator, PyWin32Enumerator
+from ordering import PROCESS_KEY_PREFIX
+from window_rules import WindowFilter
+
+# Per-window traces; off unless the "windows" debug category is enabled
+trace = logging.getLogger("pytaskbar.windows")
+
+GWL_STYLE = -16
+
+WM_GETICON = 0x007F
+ICON_SMALL = 0
+ICON_BIG = 1
+GCLP_HICON = -14
+SMTO_BLOCK = 0x0001
+SMTO_ABORTIFHUNG = 0x0002
+
+# One immutable record per top-level window, taken once per refresh
+WindowRecord = namedtuple("WindowRecord", ["hwnd", "title", "ex_style", "visible", "pid"])
+
+
+class WindowSource:
+    """Where the taskbar reads its windows from.
+
+    snapshot() enumerates once and returns a tuple of WindowRecord for every
+    window that belongs on the taskbar, in enumeration order. Which windows
+    belong there is decided by `filter`, see window_rules.
+    """
+
+    def __init__(self):
+        self.pids = {}         # hwnd -> pid, never changes for the life of a window
+        self.image_paths = {}  # pid -> executable path
+        self.filter = WindowFilter(self)
+        self.snapshots = 0
+        self.windows_scanned = 0  # Every window enumerated, on the taskbar or not
+
+    def snapshot(self):
+        raise NotImplementedError
+
+    def set_rules(self, rules):
+        self.filter = WindowFilter(self, rules)
+
+    def window_pid(self, hwnd):
+        pid = self.pids.get(hwnd)
+        if pid is None:
+            pid = self.pids[hwnd] = self.query_pid(hwnd)
+        return pid
+
+    def process_image_path(self, pid):
+        # Resolved once per process, dropped by prune when it exits
+        path = self.image_paths.get(pid)
+        if path is None:
+            path = self.image_paths[pid] = self.query_image_path(pid)
+        return path
+
+    def prune(self, records):
+        # Forget cached pids and image paths of windows that left the snapshot.
+        # Every record has a cached pid, so equal sizes mean nothing left.
+        if len(self.pids) > len(records):
+            live = {record.hwnd for record in records}
+            for hwnd in [hwnd for hwnd in self.pids if hwnd not in live]:
+                del self.pids[hwnd]
+            live_pids = set(self.pids.values())
+            for pid in [pid for pid in self.image_paths if pid not in live_pids]:
+                del self.image_paths[pid]
+
+    def stats(self):
+        return {
+            "snapshots": self.snapshots,
+            "windows_scanned": self.windows_scanned,
+            "cached_pids": len(self.pids),
+            "cached_image_paths": len(self.image_paths),
+        }
+
+    def query_pid(self, hwnd):
+        raise NotImplementedError
+
+    def query_image_path(self, pid):
+        raise NotImplementedError
+
+    def get_title(self, hwnd):
+        raise NotImplementedError
+
+    def get_class_name(self, hwnd):
+        raise NotImplementedError
+
+    def get_style(self, hwnd):
+        raise NotImplementedError
+
+    def is_window(self, hwnd):
+        raise NotImplementedError
+
+    def fetch_icon_handle(self, hwnd, timeout):
+        # Safe to call from a worker thread; raises TimeoutError if the window does not answer
+        raise NotImplementedError
+
+
+def records_from_columns(source, columns):
+    # The taskbar windows of one enumeration, in enumeration order
+    records = []
+    keep = source.filter.keep
+    tracing = trace.isEnabledFor(logging.DEBUG)
+    source.windows_scanned += columns.scanned
+    for hwnd, ex_style, title in zip(columns.hwnds, columns.ex_styles, columns.titles):
+        if keep(hwnd, ex_style, title):
+            if tracing:
+                trace.debug("Found: %s %s", ex_style, title)
+            records.append(WindowRecord(hwnd, title, ex_style, True, source.window_pid(hwnd)))
+        elif tracing:
+            trace.debug("Skip: %s %s", ex_style, title)
+    if tracing:
+        trace.debug("Snapshot: %d taskbar windows", len(records))
+    source.filter.prune(columns.hwnds)
+    source.prune(records)
+    return tuple(records)
+
+
+class Win32WindowSource(WindowSource):
+    def __init__(self, batched=False):
+        super().__init__()
+        # Imported here so the module stays importable off Windows
+        import win32con
+        import win32gui
+        import win32process
+        self.win32con = win32con
+        self.win32gui = win32gui
+        self.win32process = win32process
+
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.user32 = ctypes.WinDLL("user32")
+        self.user32.SendMessageTimeoutW.argtypes = [
+            wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM,
+            wintypes.UINT, wintypes.UINT, ctypes.POINTER(ctypes.c_size_t)]
+        self.user32.SendMessageTimeoutW.restype = wintypes.LPARAM
+        self.user32.GetClassLongPtrW.argtypes = [wintypes.HWND, ctypes.c_int]
+        self.user32.GetClassLongPtrW.restype = ctypes.c_size_t
+        # See enumeration; pywin32 stays the default until the batched path measures faster
+        self.enumerator = BatchedEnumerator(self.user32) if batched else PyWin32Enumerator(win32gui)
+
+    def snapshot(self):
+        self.snapshots += 1
+        return records_from_columns(self, self.enumerator.enumerate())
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({f"enumeration_{name}": value for name, value in self.enumerator.stats().items()})
+        return stats
+
+    def query_pid(self, hwnd):
+        _, pid = self.win32process.GetWindowThreadProcessId(hwnd)
+        return pid
+
+    def query_image_path(self, pid):
+        import psutil
+        try:
+            return psutil.Process(pid).exe()
+        except (psutil.Error, OSError):
+            # Elevated or already-exited processes; still unique per pid
+            return f"{PROCESS_KEY_PREFIX}{pid}"
+
+    def get_title(self, hwnd):
+        return self.win32gui.GetWindowText(hwnd)
+
+    def get_class_name(self, hwnd):
+        return self.win32gui.GetClassName(hwnd)
+
+    def get_style(self, hwnd):
+        return self.win32gui.GetWindowLong(hwnd, GWL_STYLE)
+
+    def is_window(self, hwnd):
+        return bool(self.win32gui.IsWindow(hwnd))
+
+    def fetch_icon_handle(self, hwnd, timeout):
+        result = self.ctypes.c_size_t()
+        for icon_type in (ICON_SMALL, ICON_BIG):
+            # SMTO_ABORTIFHUNG returns at once for windows the system already considers hung
+            if not self.user32.SendMessageTimeoutW(hwnd, WM_GETICON, icon_type, 0, SMTO_ABORTIFHUNG | SMTO_BLOCK,
+                                                   int(timeout * 1000), self.ctypes.byref(result)):
+                raise TimeoutError(hwnd)
+            if result.value:
+                return result.value
+        # No icon set on the window, fall back to the class icon
+        return self.user32.GetClassLongPtrW(hwnd, GCLP_HICON)
+
+
+class FakeWindowSource(WindowSource):
+    """In-memory window source for tests and benchmarks.
+
+    Windows are kept in z-order; every simulated Win32 call is tallied in
+    `calls` so a benchmark can report API round-trips per refresh. Icons can
+    be made slow (`icon_delays`, seconds) or hung (`hung`) to exercise the
+    timeout path.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.windows = {}
+        self.icons = {}        # hwnd -> icon handle
+        self.icon_delays = {}  # hwnd -> seconds before WM_GETICON answers
+        self.hung = set()
+        self.class_names = {}  # hwnd -> window class, "Window" unless given
+        self.styles = {}       # hwnd -> window style
+        self.calls = Counter()
+        self._next_hwnd = 0x10000
+
+    def add_window(self, title, ex_style=0, visible=True, pid=1000, hwnd=None, class_name="Window", style=0):
+        if hwnd is None:
+            hwnd = self._next_hwnd
+            self._next_hwnd += 2
+        self.windows[hwnd] = WindowRecord(hwnd, title, ex_style, visible, pid)
+        self.class_names[hwnd] = class_name
+        self.styles[hwnd] = style
+        return hwnd
+
+    def remove_window(self, hwnd):
+        self.windows.pop(hwnd, None)
+        self.class_names.pop(hwnd, None)
+        self.styles.pop(hwnd, None)
+
+    def set_title(self, hwnd, title):
+        self.windows[hwnd] = self.windows[hwnd]._replace(title=title)
+
+    def snapshot(self):
+        self.calls["EnumWindows"] += 1
+        self.snapshots += 1
+        records = []
+        visible_windows = []
+        keep = self.filter.keep
+        for record in self.windows.values():
+            self.windows_scanned += 1
+            self.calls["GetWindowLong"] += 1
+            self.calls["IsWindowVisible"] += 1
+            if not record.visible:
+                continue
+            visible_windows.append(record.hwnd)
+            self.calls["GetWindowText"] += 1
+            if keep(record.hwnd, record.ex_style, record.title):
+                self.window_pid(record.hwnd)
+                records.append(record)
+        self.filter.prune(visible_windows)
+        self.prune(records)
+        return tuple(records)
+
+    def query_pid(self, hwnd):
+        self.calls["GetWindowThreadProcessId"] += 1
+        return self.windows[hwnd].pid
+
+    def query_image_path(self, pid):
+        self.calls["QueryFullProcessImageName"] += 1
+        return f"C:\\Program Files\\App{pid}\\app{pid}.exe"
+
+    def get_title(self, hwnd):
+        self.calls["GetWindowText"] += 1
+        record = self.windows.get(hwnd)
+        return record.title if record else ""
+
+    def get_class_name(self, hwnd):
+        self.calls["GetClassName"] += 1
+        return self.class_names.get(hwnd, "")
+
+    def get_style(self, hwnd):
+        self.calls["GetWindowLong"] += 1
+        return self.styles.get(hwnd, 0)
+
+    def is_window(self, hwnd):
+        self.calls["IsWindow"] += 1
+        return hwnd in self.windows
+
+    def fetch_icon_handle(self, hwnd, timeout):
+        self.calls["SendMessageTimeout"] += 1
+        delay = timeout if hwnd in self.hung else self.icon_delays.get(hwnd, 0)
+        if delay >= timeout:
+            time.sleep(timeout)
+            raise TimeoutError(hwnd)
+        if delay:
+            time.sleep(delay)
+        return self.icons.get(hwnd, 0)
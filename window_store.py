@@ -0,0 +1,141 @@
+"""The model's record of every window on the bar.
+
+WindowStore keeps one WindowEntry per window for as long as the window
+lives, indexed by hwnd. A refresh does not replace the entries; sync()
+updates them in place and reports what changed, and place() finds moved
+entries by comparing the new display order with the last one entry by
+entry. The bars' rows are these entries, so a widget always shows the
+entry's current state.
+
+WindowEntry uses __slots__ and holds only what a row shows: no
+per-object __dict__, and attribute access is a fixed offset. State kept
+elsewhere is not copied here (the icon binding lives in the IconCache,
+hung windows in the IconFetchPool), so an entry is smaller than the
+snapshot record it replaces.
+
+Each refresh comes out as a TaskbarPatch; TaskbarModel.apply_taskbar_patch
+only redoes the row layout when windows were added, removed or moved, and
+only rebinds the visible buttons when titles alone changed.
+"""
+
+
+class WindowEntry:
+    __slots__ = ("hwnd", "pid", "title")
+
+    def __init__(self, hwnd, pid, title):
+        self.hwnd = hwnd
+        self.pid = pid
+        self.title = title
+
+    def __repr__(self):
+        return f"WindowEntry({self.hwnd:#x}, {self.pid}, {self.title!r})"
+
+
+class TaskbarPatch:
+    """Minimal set of changes turning one displayed snapshot into the next.
+
+    added:    (index, entry) for windows that need a new button
+    removed:  hwnd of every button to delete
+    retitled: entry whose title changed
+    moved:    (index, hwnd) for surviving buttons whose row changed
+    """
+
+    __slots__ = ("added", "removed", "retitled", "moved")
+
+    def __init__(self, added=(), removed=(), retitled=(), moved=()):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.retitled = list(retitled)
+        self.moved = list(moved)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.retitled or self.moved)
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.retitled) + len(self.moved)
+
+    def __repr__(self):
+        return (f"TaskbarPatch(added={self.added!r}, removed={self.removed!r}, "
+                f"retitled={self.retitled!r}, moved={self.moved!r})")
+
+
+class WindowStore:
+    def __init__(self):
+        self.entries = {}  # hwnd -> WindowEntry
+        self.ordered = ()  # The entries in the order last placed
+        self.title_changes = 0
+
+    def __contains__(self, hwnd):
+        return hwnd in self.entries
+
+    def __getitem__(self, hwnd):
+        return self.entries[hwnd]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, hwnd):
+        return self.entries.get(hwnd)
+
+    def clear(self):
+        self.entries = {}
+        self.ordered = ()
+
+    def sync(self, records):
+        # Returns (added entries, removed hwnds, retitled entries) for a snapshot of records
+        entries = self.entries
+        added = []
+        retitled = []
+        for record in records:
+            entry = entries.get(record.hwnd)
+            if entry is None:
+                entry = entries[record.hwnd] = WindowEntry(record.hwnd, record.pid, record.title)
+                added.append(entry)
+            elif record.title != entry.title:
+                # A str comparison checks the length first; keeping a hash per entry would cost more than it saves
+                entry.title = record.title
+                retitled.append(entry)
+        removed = []
+        if len(entries) > len(records):
+            live = {record.hwnd for record in records}
+            removed = [hwnd for hwnd in entries if hwnd not in live]
+            for hwnd in removed:
+                del entries[hwnd]
+        self.title_changes += len(retitled)
+        return added, removed, retitled
+
+    def place(self, ordered, added=()):
+        # Remember the order; returns ((index, entry) for `added`, (index, hwnd) for other entries that moved).
+        # An entry not at the index it held last time has moved, and then the last order has another entry there
+        previous = self.ordered
+        new = {id(entry) for entry in added}
+        placed = []
+        moved = []
+        for index, entry in enumerate(ordered):
+            if index < len(previous) and previous[index] is entry:
+                continue
+            if id(entry) in new:
+                placed.append((index, entry))
+            else:
+                moved.append((index, entry.hwnd))
+        self.ordered = ordered
+        return placed, moved
+
+    def apply(self, records, ordered):
+        # sync() and place() as one TaskbarPatch; `ordered(entries)` puts the entries in display order
+        added, removed, retitled = self.sync(records)
+        snapshot = ordered(self.entries)
+        placed, moved = self.place(snapshot, added)
+        return snapshot, TaskbarPatch(placed, removed, retitled, moved)
+
+    def retitle(self, hwnd, title):
+        # Returns True if the title changed
+        entry = self.entries[hwnd]
+        if title == entry.title:
+            return False
+        entry.title = title
+        self.title_changes += 1
+        return True
+
+    def stats(self):
+        return {"entries": len(self.entries), "title_changes": self.title_changes}